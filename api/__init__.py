@@ -2,7 +2,10 @@
 API package initializer that configures all routes.
 """
 
-from flask import Blueprint, Flask, jsonify
+from flask import Blueprint, Flask, Response
+
+# Static response bodies are encoded once instead of on every request
+_HEALTHY_BODY = b'{"status":"healthy"}'
 
 def init_api_routes(app: Flask, api_logger, llm_logger):
     """Initialize all API routes with the Flask application"""
@@ -16,7 +19,7 @@ def init_api_routes(app: Flask, api_logger, llm_logger):
     @api_bp.route('/health')
     def health_check():
         api_logger.info("Health check endpoint was called.")
-        return jsonify({"status": "healthy"})
+        return Response(_HEALTHY_BODY, mimetype="application/json")
 
     # Register nested blueprints
     api_bp.register_blueprint(character_endpoints.blueprint, url_prefix="/characters")
@@ -1,7 +1,10 @@
 """
 API endpoints for character management.
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
+from bson import ObjectId, json_util
+from bson.codec_options import CodecOptions
+import orjson
 from storage.database.db_handler import db_handler
 import logging
 
@@ -10,37 +13,74 @@ logger = logging.getLogger(__name__)
 # Create the Blueprint for character endpoints
 blueprint = Blueprint('characters', __name__)
 
+class _CharacterDoc(dict):
+    """Document class that exposes _id as a string "id" while BSON is decoded."""
+
+    def __setitem__(self, key, value):
+        if key == "_id":
+            key, value = "id", str(value)
+        dict.__setitem__(self, key, value)
+
+# Collection handle is resolved once at import instead of on every request
+_characters = db_handler.get_collection(
+    "characters", codec_options=CodecOptions(document_class=_CharacterDoc)
+)
+
+# Only the fields the character list needs are sent back by MongoDB,
+# with _id already renamed to a string id on the server
+_LIST_PIPELINE = [
+    {"$project": {
+        "_id": 0,
+        "id": {"$toString": "$_id"},
+        "name": 1,
+        "personality": 1,
+        "background": 1,
+        "mood": 1,
+    }},
+]
+_LIST_BATCH_SIZE = 1000
+# The relationships map grows with the cast size and is not needed by clients
+_DETAIL_PROJECTION = {"relationships": 0}
+
+def _json_response(data):
+    """Encodes BSON-derived data straight into a JSON response."""
+    return Response(json_util.dumps(data), mimetype="application/json")
+
+def _stream_json_array(cursor):
+    """Yields a JSON array one encoded document at a time."""
+    yield b"["
+    separator = b""
+    for doc in cursor:
+        yield separator + orjson.dumps(doc, default=str)
+        separator = b","
+    yield b"]"
+
 @blueprint.route("/", methods=["GET"])
 def get_all_characters():
     """Get all characters"""
     try:
-        characters_collection = db_handler.get_collection("characters")
-        characters = list(characters_collection.find({}))
-        
-        # Convert ObjectId to string for JSON serialization
-        for char in characters:
-            char["id"] = str(char["_id"])
-            del char["_id"]
-            
-        return jsonify(characters)
+        # The first batch is fetched here, so query errors still produce a 500
+        cursor = _characters.aggregate(_LIST_PIPELINE, batchSize=_LIST_BATCH_SIZE)
+        return Response(_stream_json_array(cursor), mimetype="application/json")
     except Exception as e:
-        logger.error(f"Error fetching characters: {str(e)}")
+        logger.error("Error fetching characters: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @blueprint.route("/<character_id>", methods=["GET"])
 def get_character(character_id):
     """Get a specific character by ID"""
     try:
-        characters_collection = db_handler.get_collection("characters")
-        character = characters_collection.find_one({"_id": character_id})
-        
+        # Ids may be stored as ObjectId or as a plain string (slug); match either
+        # form so the lookup always resolves through the _id index.
+        id_filter = character_id
+        if ObjectId.is_valid(character_id):
+            id_filter = {"$in": [ObjectId(character_id), character_id]}
+        character = _characters.find_one({"_id": id_filter}, projection=_DETAIL_PROJECTION)
+
         if not character:
             return jsonify({"error": "Character not found"}), 404
-            
-        character["id"] = str(character["_id"])
-        del character["_id"]
-        
-        return jsonify(character)
+
+        return _json_response(character)
     except Exception as e:
-        logger.error(f"Error fetching character: {str(e)}")
+        logger.error("Error fetching character: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
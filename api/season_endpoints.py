@@ -1,52 +1,106 @@
 """
 API endpoints for season management.
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, current_app, jsonify
 import logging
 import asyncio
+import concurrent.futures
+import orjson
+
+from storage.database.cleanup import archive_season
 
 logger = logging.getLogger(__name__)
 
 # Create the Blueprint for season endpoints
 blueprint = Blueprint('seasons', __name__)
 
+_NO_SEASONS_BODY = b'{"seasons":[]}'
+
+_ENDING_STATUS = "Ending Season"
+
+def _finish_season(cleared):
+    """
+    Closes the season record, resets the server state and tells the director
+    the season is over. Runs once GameLoop.end_game has returned.
+    """
+    from web.app import game_state, socketio, DIRECTOR_ROOM
+
+    # Close the season record too, when seasons are tracked
+    result = archive_season()
+    if "error" in result:
+        logger.info("No season record closed: %s", result["error"])
+
+    # Reset server state
+    game_state["is_running"] = False
+    game_state["status"] = "Idle"
+    game_state["game_loop"] = None
+
+    if not cleared:
+        message = "Season ended, but its data could not be cleared."
+        socketio.emit('game_state', {"status": "Idle", "message": message}, to=DIRECTOR_ROOM)
+        return message
+
+    socketio.emit('game_state', {"status": "Idle", "message": "Season ended. All data archived and cleared."}, to=DIRECTOR_ROOM)
+    logger.info("Season ended and data cleared via API.")
+    return None
+
+def _on_end_game_done(future):
+    """Finishes a season whose end_game outlasted the request that started it."""
+    try:
+        cleared = future.result()
+    except Exception as e:
+        logger.error("Error ending season: %s", e)
+        cleared = False
+    _finish_season(cleared)
+
 @blueprint.route("/end", methods=["POST"])
 def end_current_season():
     """
     End the current season and clean up all related data.
     """
     # Import here to avoid circular dependencies at startup
-    from web.app import game_state, socketio
+    from web.app import game_state, socketio, DIRECTOR_ROOM
     
     if not game_state["is_running"]:
         return jsonify({"success": False, "message": "No active season to end."})
+    if game_state["status"] == _ENDING_STATUS:
+        return jsonify({"success": True, "status": _ENDING_STATUS, "message": "The season is already ending."}), 202
 
     logger.info("API call to end current season...")
     try:
+        cleared = True
         if game_state.get("game_loop"):
-            loop = game_state["game_loop"]
-            asyncio.run(loop.end_game())
-        
-        # Reset server state
-        game_state["is_running"] = False
-        game_state["status"] = "Idle"
-        game_state["game_loop"] = None
-        
-        socketio.emit('game_state', {"status": "Idle", "message": "Season ended. All data archived and cleared."}, broadcast=True)
-        logger.info("Season ended and data cleared via API.")
+            # Run on the app's persistent event loop instead of creating one per request
+            future = asyncio.run_coroutine_threadsafe(
+                game_state["game_loop"].end_game(), current_app.config['ASYNC_LOOP']
+            )
+            try:
+                cleared = future.result(timeout=30)
+            except concurrent.futures.TimeoutError:
+                # end_game keeps running on the loop; the season is finished
+                # (archived, state reset, director notified) when it returns
+                game_state["status"] = _ENDING_STATUS
+                future.add_done_callback(_on_end_game_done)
+                socketio.emit('game_state', {"status": _ENDING_STATUS, "message": "Ending the season..."}, to=DIRECTOR_ROOM)
+                return jsonify({"success": True, "status": _ENDING_STATUS, "message": "The season is still ending."}), 202
+
+        message = _finish_season(cleared)
+        if message:
+            return jsonify({"success": False, "message": message}), 500
         return jsonify({"success": True, "message": "Season ended successfully"})
     except Exception as e:
-        logger.error(f"Error ending season: {str(e)}")
+        logger.error("Error ending season: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @blueprint.route("/", methods=["GET"])
 def get_seasons():
     """Get all seasons"""
     # Placeholder for fetching season data from a persistent store
-    return jsonify({"seasons": []})
+    return Response(_NO_SEASONS_BODY, mimetype="application/json")
 
 @blueprint.route("/<int:season_id>", methods=["GET"])
 def get_season(season_id):
     """Get a specific season by ID"""
     # Placeholder for fetching season data from a persistent store
-    return jsonify({"season_id": season_id, "name": f"Season {season_id}"})
+    body = orjson.dumps({"season_id": season_id, "name": f"Season {season_id}"})
+    return Response(body, mimetype="application/json")
@@ -1,13 +1,17 @@
+import sys
 from storage.database.db_handler import db_handler
 
 def check_characters():
-    characters = list(db_handler.get_collection('characters').find({}, {'_id': 1, 'name': 1}))
-    if not characters:
+    cursor = db_handler.get_collection('characters').find({}, {'_id': 1, 'name': 1}, batch_size=1000)
+    lines = [f"ID: {char.get('_id')}, Name: {char.get('name', 'Unknown')}".encode() for char in cursor]
+    if not lines:
         print("No characters found in the database")
     else:
-        print(f"Found {len(characters)} characters:")
-        for char in characters:
-            print(f"ID: {char.get('_id')}, Name: {char.get('name', 'Unknown')}")
+        # One buffered write for the whole listing instead of a print per row
+        out = sys.stdout.buffer
+        out.write(f"Found {len(lines)} characters:\n".encode())
+        out.write(b"\n".join(lines) + b"\n")
+        out.flush()
 
 if __name__ == "__main__":
     check_characters()
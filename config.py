@@ -1,16 +1,41 @@
-from pydantic_settings import BaseSettings
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", case_sensitive=False)
+
     MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://mongodb:27017/")
     DB_NAME: str = os.getenv("DB_NAME", "voice_island")
+    # Connection pool of the shared MongoClient. Async DB calls run on the default
+    # thread pool (at most 32 workers), so every in-flight call can hold a connection.
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))  # Kept open so handlers don't pay connection setup
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))  # Recycle connections idle this long
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))  # Fail instead of queueing forever
+    MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "45000"))  # Give up on a hung connection
+    MONGO_APP_NAME: str = os.getenv("MONGO_APP_NAME", "voice-island")  # Shown in server logs and currentOp
     OLLAMA_HOST: str = os.getenv("OLLAMA_HOST", "http://host.docker.internal:11434")
+    # Concurrent LLM calls (e.g. LLMHandler.retrieve_context) are only served in
+    # parallel when the Ollama server itself is started with the same variables:
+    #   OLLAMA_NUM_PARALLEL=<n>       requests processed at once per loaded model
+    #   OLLAMA_MAX_LOADED_MODELS=<n>  models kept in memory simultaneously
+    # LLMHandler caps its in-flight requests at OLLAMA_NUM_PARALLEL.
+    OLLAMA_NUM_PARALLEL: int = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+    OLLAMA_MAX_LOADED_MODELS: int = int(os.getenv("OLLAMA_MAX_LOADED_MODELS", "1"))
+    EMBED_MODEL: str = os.getenv("EMBED_MODEL", "mxbai-embed-large")  # Used to rank context in LLMHandler.retrieve_context
+    LLM_CACHE_TTL: float = float(os.getenv("LLM_CACHE_TTL", "300"))  # Seconds; 0 disables the cache
+    LLM_CACHE_MAXSIZE: int = int(os.getenv("LLM_CACHE_MAXSIZE", "256"))
+    FAST_MODEL: str = os.getenv("FAST_MODEL", "")  # Smaller model for low-stakes story turns; empty uses the director's model
+    TTS_WORKERS: int = int(os.getenv("TTS_WORKERS", "1"))  # Processes (each with its own model) for async speech synthesis
+    AUDIO_DIR: str = os.getenv("AUDIO_DIR", "audio")  # Synthesized character lines, one .wav per turn
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = 'utf-8'
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Returns the process-wide settings, parsing the environment only once."""
+    return Settings()
 
-settings = Settings()
+settings = get_settings()
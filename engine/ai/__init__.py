@@ -1 +1 @@
-from .llm_handler import LLMHandler
+from .llm_handler import LLMHandler, dump_schema, get_llm_handler
@@ -1,35 +1,228 @@
-import ollama
+import httpx
 from config import settings
 import asyncio
-import json
-import re
+import copy
+import functools
+import hashlib
+import heapq
+import orjson
+import os
+import time
 import logging
-from typing import Dict, List, Optional, Union, Any
+from collections import OrderedDict
+import numpy as np
+from typing import Callable, Dict, List, Optional, Union, Any
 
 # Configure logger for LLM interactions
 logger = logging.getLogger('llm.handler')
 
-class LLMHandler:
+# JSON schemas are constants, so they are built and serialized once at import
+SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {
+            "type": "string",
+            "description": "A concise summary of the conversation in no more than 3 sentences"
+        },
+        "key_points": {
+            "type": "array",
+            "items": {
+                "type": "string"
+            },
+            "description": "1-3 key points from the conversation"
+        },
+        "sentiment": {
+            "type": "string",
+            "enum": ["positive", "negative", "neutral", "mixed"],
+            "description": "The overall sentiment of the conversation"
+        }
+    },
+    "required": ["summary", "key_points", "sentiment"]
+}
+
+SCORE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {
+            "type": "number",
+            "description": "Relevance of the context item to the query, from 0.0 to 1.0"
+        }
+    },
+    "required": ["score"]
+}
+
+def dump_schema(schema: dict) -> str:
+    """Serializes a JSON schema the way get_response embeds it in prompts."""
+    return orjson.dumps(schema).decode()
+
+_SUMMARY_SCHEMA_STR = dump_schema(SUMMARY_SCHEMA)
+_SCORE_SCHEMA_STR = dump_schema(SCORE_SCHEMA)
+
+_SUMMARY_INSTRUCTIONS = "Provide a concise summary, key points, and the overall sentiment of the conversation."
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Upper bound on cached context embeddings
+_EMBED_CACHE_MAXSIZE = 4096
+
+class _JsonEndTracker:
+    """
+    Incrementally follows bracket depth in streamed JSON text so a response
+    can be cut off as soon as its top-level value is complete.
+    """
+
     def __init__(self):
-        self.client = ollama.AsyncClient(host=settings.OLLAMA_HOST)
-        logger.info(f"LLMHandler initialized with Ollama host: {settings.OLLAMA_HOST}")
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consumes a chunk of text; returns True once the top-level value has closed."""
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                self.started = True
+            elif ch in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return True
+        return False
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Creates the long-lived HTTP client used to talk to Ollama.
+    Connections are kept alive and reused across requests instead of
+    paying the TCP handshake on every call.
+    """
+    return httpx.AsyncClient(
+        base_url=settings.OLLAMA_HOST,
+        timeout=None,  # Generation time is unbounded
+        limits=httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30),
+    )
+
+class LLMHandler:
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            http_client: Optional shared client. One is created if not provided.
+        """
+        self._http = http_client or create_http_client()
+        # Response cache: key -> (expiry time, response), kept in LRU order
+        self._cache: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._cache_ttl = settings.LLM_CACHE_TTL
+        self._cache_maxsize = settings.LLM_CACHE_MAXSIZE
+        # Embedding cache: content hash -> vector, kept in LRU order
+        self._embed_model = settings.EMBED_MODEL
+        self._embed_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        # Ollama only serves OLLAMA_NUM_PARALLEL requests at once; anything above
+        # that just queues on the server, so hold extra requests on the client.
+        self._sem = asyncio.Semaphore(max(1, settings.OLLAMA_NUM_PARALLEL))
+        logger.info("LLMHandler initialized with Ollama host: %s", settings.OLLAMA_HOST)
+        if "OLLAMA_NUM_PARALLEL" not in os.environ:
+            logger.warning(
+                "OLLAMA_NUM_PARALLEL is not set; assuming %s. "
+                "Start the Ollama server with a matching OLLAMA_NUM_PARALLEL to serve concurrent requests.",
+                settings.OLLAMA_NUM_PARALLEL
+            )
+
+    async def close(self):
+        """Closes the underlying HTTP connection pool."""
+        await self._http.aclose()
+
+    async def _chat(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Sends a non-streaming request to Ollama's /api/chat endpoint."""
+        async with self._sem:
+            resp = await self._http.post(
+                "/api/chat", content=orjson.dumps({**params, "stream": False}), headers=_JSON_HEADERS
+            )
+        resp.raise_for_status()
+        return resp.json()
+
+    @staticmethod
+    def _cache_key(model: str, content: str) -> str:
+        """Builds the response cache key for a fully rendered JSON request."""
+        return hashlib.blake2b(f"{model}|{content}".encode(), digest_size=16).hexdigest()
+
+    def _cache_get(self, key: str):
+        """Returns a copy of a cached response, or None on a miss or expired entry."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        # Callers may mutate the result, so never hand out the cached object itself
+        return copy.deepcopy(value)
+
+    def _cache_set(self, key: str, value: Any):
+        """Stores a response, evicting the least recently used entry when full."""
+        if self._cache_maxsize <= 0 or self._cache_ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self._cache_ttl, copy.deepcopy(value))
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_maxsize:
+            self._cache.popitem(last=False)
+
+    async def _chat_stream(self, params: Dict[str, Any], stop_on_json: bool = False) -> str:
+        """
+        Streams a response from Ollama's /api/chat endpoint and returns the full text.
+        If stop_on_json is set, the stream is closed as soon as the top-level JSON
+        value is complete instead of waiting for the model's end-of-turn.
+        """
+        parts = []
+        tracker = _JsonEndTracker() if stop_on_json else None
+        body = orjson.dumps({**params, "stream": True})
+        async with self._sem, self._http.stream("POST", "/api/chat", content=body, headers=_JSON_HEADERS) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                chunk = orjson.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                piece = chunk.get("message", {}).get("content", "")
+                parts.append(piece)
+                if chunk.get("done"):
+                    break
+                if tracker is not None and tracker.feed(piece):
+                    logger.debug("JSON response complete, closing stream early")
+                    break
+        return "".join(parts)
+
+    async def _ps(self) -> Dict[str, Any]:
+        """Queries Ollama's /api/ps endpoint for the loaded models."""
+        resp = await self._http.get("/api/ps")
+        resp.raise_for_status()
+        return resp.json()
 
     async def get_running_models(self):
         """Gets the list of currently loaded models from Ollama."""
         try:
             logger.debug("Fetching running models from Ollama")
             # Use ps() to get currently loaded models, which aligns with the function's purpose
-            models_info = await self.client.ps()
+            models_info = await self._ps()
             if 'models' in models_info:
                 # Use .get() for safer access and filter out models without a name
                 model_names = [model.get('name') for model in models_info['models']]
                 model_names = [name for name in model_names if name]
-                logger.info(f"Found {len(model_names)} running models: {model_names}")
+                logger.info("Found %d running models: %s", len(model_names), model_names)
                 return model_names
             logger.warning("'models' key not found in ollama ps response.")
             return []
         except Exception as e:
-            logger.error(f"Failed to get running models from Ollama: {str(e)}")
+            logger.error("Failed to get running models from Ollama: %s", e)
             return []
 
     async def ping(self):
@@ -37,43 +230,57 @@ class LLMHandler:
         try:
             # The ps() method is a lightweight way to check for a connection.
             logger.debug("Pinging Ollama service")
-            await self.client.ps()
+            await self._ps()
             logger.debug("Ollama ping successful")
             return True
         except Exception as e:
-            logger.error(f"Failed to ping Ollama service: {str(e)}")
+            logger.error("Failed to ping Ollama service: %s", e)
             return False
 
-    async def get_response(self, prompt: Union[str, Dict[str, Any]], model: str = "gemma3:4b", json_format: bool = False, schema: dict = None):
+    async def get_response(self, prompt: Union[str, Dict[str, Any], List[Any]], model: str = "gemma3:4b", json_format: bool = False, schema: dict = None, schema_str: Optional[str] = None, system: Optional[str] = None, validate: Optional[Callable[[Any], bool]] = None):
         """
         Gets a response from the LLM asynchronously.
         
         Args:
-            prompt: The input prompt for the LLM (string or JSON dict)
+            prompt: The input prompt for the LLM (string, or JSON dict/list)
             model: The model to use
             json_format: Whether the response should be in JSON format
             schema: Optional JSON schema to include in the prompt for validation
+            schema_str: Optional pre-serialized schema; takes precedence over schema
+            system: Optional system message sent ahead of the prompt. Keeping fixed
+                instructions here gives every request the same prefix, which
+                Ollama can reuse from its KV cache instead of evaluating again.
+            validate: Optional check of a parsed JSON response. Responses failing it
+                are still returned but not cached, so a retry asks the model again.
         
         Returns:
             If json_format is True, returns a Python dict.
             Otherwise, returns a string response.
         """
+        # Debug details are only assembled when DEBUG logging is actually enabled
+        debug = logger.isEnabledFor(logging.DEBUG)
         try:
             # Process the prompt if it's a dictionary
-            if isinstance(prompt, dict):
-                content = json.dumps(prompt, indent=2)
-                logger.debug(f"Sending JSON prompt to model {model} (length: {len(content)} chars)")
-                logger.debug(f"JSON prompt structure keys: {list(prompt.keys())}")
+            if isinstance(prompt, (dict, list)):
+                # Compact encoding: the model does not need pretty printing
+                content = orjson.dumps(prompt).decode()
+                if debug:
+                    logger.debug("Sending JSON prompt to model %s (length: %d chars)", model, len(content))
+                    logger.debug("JSON prompt structure keys: %s", list(prompt.keys()) if isinstance(prompt, dict) else "list prompt")
             else:
                 content = prompt
-                logger.debug(f"Sending string prompt to model {model} (length: {len(content)} chars)")
+                if debug:
+                    logger.debug("Sending string prompt to model %s (length: %d chars)", model, len(content))
                 
             # Log first 100 chars of content for debugging
-            logger.debug(f"Prompt preview: {content[:100]}...")
+            if debug:
+                logger.debug("Prompt preview: %s...", content[:100])
 
+            messages = [{'role': 'system', 'content': system}] if system else []
+            messages.append({'role': 'user', 'content': content})
             params = {
                 'model': model,
-                'messages': [{'role': 'user', 'content': content}]
+                'messages': messages
             }
             
             if json_format:
@@ -81,52 +288,67 @@ class LLMHandler:
                 logger.debug("Requesting JSON format output")
                 
                 # If a schema is provided, include it in the prompt
-                if schema:
-                    schema_str = json.dumps(schema, indent=2)
+                if schema_str is None and schema:
+                    schema_str = dump_schema(schema)
+                if schema_str:
                     # Append the schema to the prompt
                     schema_instruction = f"\n\nYour response must conform to this JSON schema:\n```json\n{schema_str}\n```\nEnsure your response is valid JSON with no markdown formatting."
-                    params['messages'][0]['content'] += schema_instruction
-                    logger.debug(f"Added JSON schema validation with {len(schema.keys())} root properties")
-
-            logger.info(f"Sending request to Ollama model: {model}")
-            response = await self.client.chat(**params)
-            content = response['message']['content']
-            logger.info(f"Received response from Ollama (length: {len(content)} chars)")
-            logger.debug(f"Raw response from model: {content}")
+                    messages[-1]['content'] += schema_instruction
+                    logger.debug("Added JSON schema validation (%d chars)", len(schema_str))
+
+            # Only structured JSON answers are cached; free text is meant to vary per turn
+            if json_format:
+                cache_key = self._cache_key(model, f"{system or ''}|{messages[-1]['content']}")
+                cached = self._cache_get(cache_key)
+                if cached is not None:
+                    logger.info("Returning cached response for model: %s", model)
+                    return cached
+
+            logger.info("Sending request to Ollama model: %s", model)
+            content = await self._chat_stream(params, stop_on_json=json_format)
+            logger.info("Received response from Ollama (length: %d chars)", len(content))
+            logger.debug("Raw response from model: %s", content)
             
             # Process the response if JSON format is requested
             if json_format:
                 # Try to extract JSON from the response if it's wrapped in markdown code blocks
                 logger.debug("Attempting to extract and parse JSON from response")
                 content = self._extract_json(content)
-                logger.debug(f"Content after JSON extraction: {content}")
+                logger.debug("Content after JSON extraction: %s", content)
                 
                 try:
                     # Parse the JSON
-                    parsed_content = json.loads(content)
-                    logger.debug(f"Successfully parsed JSON response with keys: {list(parsed_content.keys()) if isinstance(parsed_content, dict) else 'non-dict response'}")
+                    parsed_content = orjson.loads(content)
+                    if debug:
+                        logger.debug("Parsed JSON response:\n%s", orjson.dumps(parsed_content, option=orjson.OPT_INDENT_2).decode())
+                    if validate is None or validate(parsed_content):
+                        self._cache_set(cache_key, parsed_content)
                     return parsed_content
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error parsing JSON response: {e}")
-                    logger.error(f"Raw response: {content[:500]}...")  # Log first 500 chars of problematic response
+                except orjson.JSONDecodeError as e:
+                    logger.error("Error parsing JSON response: %s", e)
+                    logger.error("Raw response: %s...", content[:500])  # Log first 500 chars of problematic response
                     # Return the raw content in case of parsing error
                     return content
             
             return content
         except Exception as e:
-            logger.error(f"Error communicating with Ollama: {type(e).__name__}: {str(e)}")
+            logger.error("Error communicating with Ollama: %s: %s", type(e).__name__, e)
             return None
-            
+
     def _extract_json(self, text):
         """Extract JSON from markdown code blocks or plain text."""
-        # Try to find JSON in code blocks
-        json_pattern = r"```(?:json)?\s*([\s\S]*?)\s*```"
-        matches = re.findall(json_pattern, text)
-        
-        if matches:
-            # Take the first JSON code block found
-            logger.debug("Found JSON in code block, extracting")
-            return matches[0]
+        # Find the first fenced code block with plain substring scans; this is a
+        # single linear pass with no regex backtracking on malformed responses.
+        start = text.find("```")
+        if start != -1:
+            end = text.find("```", start + 3)
+            if end != -1:
+                block = text[start + 3:end]
+                if block.startswith("json"):
+                    block = block[4:]
+                # Take the first JSON code block found
+                logger.debug("Found JSON in code block, extracting")
+                return block.strip()
         # If no code blocks, return the original text
         logger.debug("No JSON code blocks found, using raw text")
         return text
@@ -144,58 +366,22 @@ class LLMHandler:
             If json_format is True, a dict with summary data.
             Otherwise, a string with the summary.
         """
-        logger.info(f"Summarizing conversation with model {model}, json_format={json_format}")
+        logger.info("Summarizing conversation with model %s, json_format=%s", model, json_format)
         if isinstance(conversation_history, list):
-            logger.debug(f"Conversation history contains {len(conversation_history)} messages")
+            logger.debug("Conversation history contains %d messages", len(conversation_history))
         else:
-            logger.debug(f"Conversation history is string of length {len(conversation_history)}")
+            logger.debug("Conversation history is string of length %d", len(conversation_history))
             
         if json_format:
-            # Define a JSON schema for summarization
-            schema = {
-                "type": "object",
-                "properties": {
-                    "summary": {
-                        "type": "string",
-                        "description": "A concise summary of the conversation in no more than 3 sentences"
-                    },
-                    "key_points": {
-                        "type": "array",
-                        "items": {
-                            "type": "string"
-                        },
-                        "description": "1-3 key points from the conversation"
-                    },
-                    "sentiment": {
-                        "type": "string",
-                        "enum": ["positive", "negative", "neutral", "mixed"],
-                        "description": "The overall sentiment of the conversation"
-                    }
-                },
-                "required": ["summary", "key_points", "sentiment"]
+            prompt = {
+                "task": "summarize_conversation",
+                "conversation": conversation_history,
+                "format": "json",
+                "instructions": _SUMMARY_INSTRUCTIONS
             }
             
-            # Handle different formats of conversation_history
-            if isinstance(conversation_history, list):
-                # Convert list of message dicts to JSON
-                history_json = json.dumps(conversation_history, indent=2)
-                prompt = {
-                    "task": "summarize_conversation",
-                    "conversation": conversation_history,
-                    "format": "json",
-                    "instructions": "Provide a concise summary, key points, and the overall sentiment of the conversation."
-                }
-            else:
-                # Handle string format
-                prompt = {
-                    "task": "summarize_conversation",
-                    "conversation": conversation_history,
-                    "format": "json",
-                    "instructions": "Provide a concise summary, key points, and the overall sentiment of the conversation."
-                }
-            
             logger.debug("Sending conversation for JSON summarization")
-            return await self.get_response(prompt, model=model, json_format=True, schema=schema)
+            return await self.get_response(prompt, model=model, json_format=True, schema_str=_SUMMARY_SCHEMA_STR)
         else:
             if isinstance(conversation_history, list):
                 # Convert list of message dicts to a readable string
@@ -209,88 +395,121 @@ class LLMHandler:
                 
             try:
                 logger.debug("Sending conversation for text summarization")
-                response = await self.client.chat(model=model, messages=[{'role': 'user', 'content': prompt}])
+                response = await self._chat({'model': model, 'messages': [{'role': 'user', 'content': prompt}]})
                 logger.info("Successfully received text summarization response")
                 return response['message']['content']
             except Exception as e:
-                logger.error(f"Error communicating with Ollama for summarization: {str(e)}")
+                logger.error("Error communicating with Ollama for summarization: %s", e)
                 return None
                 
+    async def _score_one(self, query_str: str, item: Dict[str, Any], model: str) -> float:
+        """Asks the LLM for a 0-1 relevance score of a single context item."""
+        prompt = {
+            "task": "score_context_relevance",
+            "query": query_str,
+            "context_item": item,
+            "instructions": "Rate how relevant the context item is to the query from 0.0 (unrelated) to 1.0 (highly relevant).",
+            "format": "json"
+        }
+        response = await self.get_response(prompt, model=model, json_format=True, schema_str=_SCORE_SCHEMA_STR)
+        if isinstance(response, dict):
+            try:
+                return float(response.get("score", 0.0))
+            except (TypeError, ValueError):
+                pass
+        logger.debug("Invalid score response, defaulting to 0.0: %s", response)
+        return 0.0
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns one embedding row per text. Embeddings are cached by content hash,
+        so only texts not seen before are sent to Ollama, in a single batch request.
+        """
+        keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self._embed_cache]
+        if missing:
+            body = orjson.dumps({"model": self._embed_model, "input": [texts[i] for i in missing]})
+            async with self._sem:
+                resp = await self._http.post("/api/embed", content=body, headers=_JSON_HEADERS)
+            resp.raise_for_status()
+            for i, vector in zip(missing, orjson.loads(resp.content)["embeddings"]):
+                self._embed_cache[keys[i]] = np.asarray(vector, dtype=np.float32)
+
+        vectors = np.stack([self._embed_cache[key] for key in keys])
+        for key in keys:
+            self._embed_cache.move_to_end(key)
+        while len(self._embed_cache) > _EMBED_CACHE_MAXSIZE:
+            self._embed_cache.popitem(last=False)
+        return vectors
+
+    async def _rank_by_embeddings(self, query_str: str, context_data: List[Dict[str, Any]], top_k: int) -> List[int]:
+        """Ranks context items by cosine similarity between their embeddings and the query's."""
+        texts = [orjson.dumps(item, default=str).decode() for item in context_data]
+        vectors = await self._embed([query_str] + texts)
+        query_vec, item_vecs = vectors[0], vectors[1:]
+        norms = np.linalg.norm(item_vecs, axis=1) * np.linalg.norm(query_vec)
+        scores = item_vecs @ query_vec / np.maximum(norms, 1e-12)
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        return top[np.argsort(-scores[top])].tolist()
+
+    async def _rank_by_llm(self, query_str: str, context_data: List[Dict[str, Any]], model: str, top_k: int) -> List[int]:
+        """Ranks context items by concurrent per-item LLM relevance scores."""
+        tasks = [self._score_one(query_str, item, model) for item in context_data]
+        scores = await asyncio.gather(*tasks)
+        logger.debug("Received context scores: %s", scores)
+        return heapq.nlargest(top_k, range(len(context_data)), key=scores.__getitem__)
+
     async def retrieve_context(self, query: Union[str, Dict[str, Any]], context_data: List[Dict[str, Any]], 
                                model: str = "gemma3:4b", top_k: int = 3) -> List[Dict[str, Any]]:
         """
         Retrieves relevant context from a list of context data based on a query.
+        Items are ranked by embedding similarity (settings.EMBED_MODEL). If embeddings
+        are unavailable, each item is scored by its own small LLM prompt instead.
         
         Args:
             query: The query to retrieve context for (string or JSON dict)
             context_data: List of context data dictionaries
-            model: The model to use
+            model: The model to use for the LLM scoring fallback
             top_k: Number of top results to return
             
         Returns:
             List of most relevant context data dictionaries
         """
-        logger.info(f"Retrieving context for query with model {model}, top_k={top_k}")
+        logger.info("Retrieving context for query with model %s, top_k=%d", model, top_k)
         
         if not context_data:
             logger.warning("No context data provided for retrieval")
             return []
+        top_k = min(top_k, len(context_data))
+        if top_k <= 0:
+            return []
             
         # Convert query to string if it's a dictionary
         if isinstance(query, dict):
-            query_str = json.dumps(query)
+            query_str = orjson.dumps(query).decode()
             logger.debug("Query is JSON, converted to string")
         else:
             query_str = query
-            logger.debug(f"Query is string of length {len(query_str)}")
-        
-        logger.debug(f"Context data contains {len(context_data)} items")
-        
-        # Prepare the prompt for context retrieval
-        schema = {
-            "type": "object",
-            "properties": {
-                "ranked_indices": {
-                    "type": "array",
-                    "items": {"type": "integer"},
-                    "description": f"Indices of the top {top_k} most relevant context items, ranked by relevance"
-                },
-                "reasoning": {
-                    "type": "string",
-                    "description": "Brief explanation of why these items were selected"
-                }
-            },
-            "required": ["ranked_indices"]
-        }
+            logger.debug("Query is string of length %d", len(query_str))
         
-        prompt = {
-            "task": "retrieve_relevant_context",
-            "query": query_str,
-            "context_data": context_data,
-            "instructions": f"Return the indices of the top {top_k} most relevant context items for the query. Index 0 is the first item.",
-            "format": "json"
-        }
+        logger.debug("Context data contains %d items", len(context_data))
         
         try:
-            logger.debug("Sending context retrieval request")
-            response = await self.get_response(prompt, model=model, json_format=True, schema=schema)
-            
-            if isinstance(response, dict) and "ranked_indices" in response:
-                indices = response["ranked_indices"]
-                logger.debug(f"Received ranked indices: {indices}")
-                # Ensure indices are valid
-                valid_indices = [i for i in indices if 0 <= i < len(context_data)]
-                if len(valid_indices) != len(indices):
-                    logger.warning(f"Some indices were invalid: {set(indices) - set(valid_indices)}")
-                # Return the relevant context data
-                result = [context_data[i] for i in valid_indices[:top_k]]
-                logger.info(f"Returning {len(result)} context items")
-                return result
-            
-            logger.warning("No valid ranked indices in response, falling back to first k items")
-            fallback = context_data[:min(top_k, len(context_data))]
-            return fallback  # Fallback to returning first k items
+            try:
+                top_indices = await self._rank_by_embeddings(query_str, context_data, top_k)
+            except Exception as e:
+                logger.warning("Embedding ranking failed (%s: %s), falling back to LLM scoring", type(e).__name__, e)
+                top_indices = await self._rank_by_llm(query_str, context_data, model, top_k)
+
+            result = [context_data[i] for i in top_indices]
+            logger.info("Returning %d context items", len(result))
+            return result
         except Exception as e:
-            logger.error(f"Error retrieving context: {type(e).__name__}: {str(e)}")
+            logger.error("Error retrieving context: %s: %s", type(e).__name__, e)
             logger.warning("Falling back to first k context items")
-            return context_data[:min(top_k, len(context_data))]  # Fallback to returning first k items
+            return context_data[:top_k]  # Fallback to returning first k items
+
+@functools.lru_cache(maxsize=1)
+def get_llm_handler() -> LLMHandler:
+    """Returns the process-wide LLMHandler so its connection pool and cache are shared."""
+    return LLMHandler()
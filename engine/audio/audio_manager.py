@@ -1,24 +1,36 @@
+import numpy as np
 import sounddevice as sd
 import soundfile as sf
 
 class AudioManager:
-    def __init__(self, sample_rate=44100):
+    def __init__(self, sample_rate=44100, max_duration=60, blocksize=4096):
         self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        # Recording buffer, allocated once and reused by every record_audio call
+        self._buf = np.empty((int(max_duration * sample_rate), 1), dtype=np.float32)
 
     def play_audio(self, file_path: str):
         """
-        Plays an audio file.
+        Plays an audio file, decoding it block by block instead of loading it whole.
         """
-        data, fs = sf.read(file_path, dtype='float32')
-        sd.play(data, fs)
-        sd.wait()
+        with sf.SoundFile(file_path) as f:
+            with sd.OutputStream(samplerate=f.samplerate, channels=f.channels, dtype='float32') as stream:
+                for block in f.blocks(blocksize=self.blocksize, dtype='float32', always_2d=True):
+                    stream.write(block)
 
     def record_audio(self, duration: int, file_path: str):
         """
         Records audio for a given duration and saves it to a file.
         """
+        frames = int(duration * self.sample_rate)
+        if frames > len(self._buf):
+            # Longer than any previous recording; grow the buffer once
+            self._buf = np.empty((frames, 1), dtype=np.float32)
+        recording = self._buf[:frames]
+
         print("Recording...")
-        recording = sd.rec(int(duration * self.sample_rate), samplerate=self.sample_rate, channels=1, dtype='float32')
+        sd.rec(samplerate=self.sample_rate, out=recording)
         sd.wait()
-        sf.write(file_path, recording, self.sample_rate)
+        with sf.SoundFile(file_path, mode="w", samplerate=self.sample_rate, channels=1) as f:
+            f.write(recording)
         print(f"Recording saved to {file_path}")
@@ -1,10 +1,16 @@
-from engine.ai import LLMHandler
+from engine.ai import dump_schema, get_llm_handler
 from engine.tts import CoquiHandler
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from storage.database.db_handler import db_handler
+from config import settings
 import random
-import json
-from datetime import datetime
+import numpy as np
+import orjson
+import functools
+import os
+from datetime import datetime, timezone
 import asyncio
 
 try:
@@ -12,41 +18,431 @@ try:
 except ImportError:
     slugify = None
 
+# Final pipeline stage shaping stored messages into prompt history entries.
+# Timestamps stay datetimes; orjson encodes them natively when the prompt is built.
+_PROMPT_MESSAGE_STAGE = {"$project": {
+    "_id": 0,
+    "speaker_id": 1,
+    "content": 1,
+    "emotion": {"$ifNull": ["$emotion", "neutral"]},
+    "timestamp": 1,
+}}
+
+_rng = np.random.default_rng()
+
+def _choose_each(pool: list, count: int) -> list:
+    """Draws one item from pool for each of count characters."""
+    return np.asarray(pool, dtype=object)[_rng.integers(0, len(pool), size=count)].tolist()
+
+def _sample_each(pool: list, count: int, k_min: int, k_max: int) -> list:
+    """Draws k_min..k_max distinct items from pool for each of count characters."""
+    items = np.asarray(pool, dtype=object)
+    ks = _rng.integers(k_min, k_max + 1, size=count)
+    # Row-wise random permutations of the pool, truncated to the largest k
+    picks = items[_rng.random((count, len(items))).argsort(axis=1)[:, :k_max]]
+    return [row[:k].tolist() for row, k in zip(picks, ks)]
+
+PROMPT_SETTING = "Voice Island reality TV show"
+
+# Prompt instructions never change, so they are encoded once
+_RESPONSE_INSTRUCTIONS = orjson.dumps({
+    "task": "Generate in-character response",
+    "response_format": "JSON",
+    "response_structure": {
+        "name": "character name",
+        "personality": ["personality_traits"],
+        "mood": "current_emotional_state",
+        "dialogue": "character's spoken response (under 80 words)",
+        "emotion": "specific_emotion_during_dialogue",
+        "action": "any_physical_action_taken",
+        "memory_note": "character's_internal_thoughts",
+        "choices": ["possible_player_response1", "possible_player_response2", "possible_player_response3"],
+        "relationships": {"character_id": "float_value"},
+        "traits": ["character_traits"],
+        "subconscious_traits": ["subconscious_traits"]
+    }
+})
+
+_OBSERVATION_DESCRIPTIONS = {
+    "general": "Observe the character's general behavior and state",
+    "private_thoughts": "Reveal the character's inner thoughts and feelings",
+    "interaction": "Analyze the character's behavior in a specific interaction",
+}
+
+@functools.lru_cache(maxsize=32)
+def _observation_instructions(observation_type: str) -> bytes:
+    """Encoded instructions for an observation type."""
+    instructions = {
+        "task": f"Generate {observation_type} observation",
+        "response_format": "JSON",
+        "response_structure": {
+            "observation": "detailed_observation_text",
+            "character_state": "emotional_mental_state",
+            "director_insights": ["insight1", "insight2", "insight3"],
+            "suggested_actions": ["possible_action1", "possible_action2"]
+        }
+    }
+    # Add observation type specific instructions
+    if observation_type in _OBSERVATION_DESCRIPTIONS:
+        instructions["description"] = _OBSERVATION_DESCRIPTIONS[observation_type]
+    return orjson.dumps(instructions)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# JSON schemas the LLM responses must conform to, serialized once
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {
+            "type": "string",
+            "description": "Character name"
+        },
+        "personality": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Character personality traits"
+        },
+        "mood": {
+            "type": "string",
+            "description": "Current mood of the character"
+        },
+        "dialogue": {
+            "type": "string",
+            "description": "Character's spoken dialogue in response to the player"
+        },
+        "emotion": {
+            "type": "string",
+            "description": "Current emotional state during this dialogue"
+        },
+        "action": {
+            "type": "string",
+            "description": "Any physical action the character takes"
+        },
+        "memory_note": {
+            "type": "string",
+            "description": "Internal thought or memory to record"
+        },
+        "choices": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Possible player interaction choices"
+        },
+        "relationships": {
+            "type": "object",
+            "additionalProperties": {"type": "number"},
+            "description": "Character's relationships with other characters"
+        },
+        "traits": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Character traits"
+        },
+        "subconscious_traits": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Character's hidden subconscious traits"
+        }
+    },
+    "required": ["name", "dialogue", "emotion"]
+}
+
+OBSERVATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "observation": {
+            "type": "string",
+            "description": "Detailed observation of the character's current state and behavior"
+        },
+        "character_state": {
+            "type": "string",
+            "description": "A brief descriptor of the character's current emotional/mental state"
+        },
+        "director_insights": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Analysis and insights for the director about this character"
+        },
+        "suggested_actions": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Potential actions the director could take regarding this character"
+        }
+    },
+    "required": ["observation", "character_state", "director_insights"]
+}
+
+_RESPONSE_SCHEMA_STR = dump_schema(RESPONSE_SCHEMA)
+_OBSERVATION_SCHEMA_STR = dump_schema(OBSERVATION_SCHEMA)
+
+# Messages fed to each conversation summary update
+SUMMARY_WINDOW = 30
+# Messages between summary updates; at most SUMMARY_WINDOW so none are skipped
+SUMMARY_INTERVAL = 20
+# Each message becomes one "speaker (emotion): content" transcript line
+_SUMMARY_LINE_STAGE = {"$project": {
+    "_id": 0,
+    "line": {"$concat": [
+        {"$ifNull": ["$speaker_id", "Unknown"]},
+        " (", {"$ifNull": ["$emotion", "neutral"]}, "): ",
+        {"$ifNull": ["$content", ""]},
+    ]},
+}}
+
 class CharacterEngine:
     def __init__(self):
         """
         Initializes the character engine with DB connections and AI/TTS handlers.
         """
-        self.llm_handler = LLMHandler()
-        self.tts_handler = CoquiHandler()
+        self.llm_handler = get_llm_handler()
+        self.tts_handler = CoquiHandler(workers=settings.TTS_WORKERS)
+        os.makedirs(settings.AUDIO_DIR, exist_ok=True)
         self.characters_collection = db_handler.get_collection("characters")
         self.conversations_collection = db_handler.get_collection("conversations")
         self.messages_collection = db_handler.get_collection("messages")
         self.world_state_collection = db_handler.get_collection("world_state")
         self.relationships_collection = db_handler.get_collection("relationships")
-        self.attribute_pools_collection = db_handler.get_collection("attribute_pools")
+        # Awaitable views used by the async interaction paths, so DB round-trips
+        # don't block the event loop while other turns wait on the LLM
+        self.characters_async = db_handler.get_async_collection("characters")
+        self.conversations_async = db_handler.get_async_collection("conversations")
+        self.messages_async = db_handler.get_async_collection("messages")
+        self.relationships_async = db_handler.get_async_collection("relationships")
+        # Cast list and prompt parts that only change when characters do; see get_cast
+        self._roster = None
+        self._prompt_skeletons = {}
+        # In-flight summary tasks and conversations waiting for a rerun; see _schedule_summary
+        self._summary_tasks = {}
+        self._summary_rerun = set()
 
     def create_characters(self, count: int):
         """
         Generates a batch of new unique characters.
         """
-        new_characters = []
-        for _ in range(count):
-            # This will handle relationships with already existing characters,
-            # including those created in the same batch.
-            new_char = self.create_character()
-            new_characters.append(new_char)
-        return new_characters
+        # Existing ids are read once for the whole batch
+        return self._create_batch(count, self._load_attribute_pools(), self._load_character_ids())
+
+    def _load_attribute_pools(self) -> dict:
+        """Returns all attribute pools as a dict of pool name -> values, cached by db_handler."""
+        return db_handler.get_attribute_pools()
+
+    def _load_character_ids(self) -> set:
+        """Reads the ids of all existing characters."""
+        # distinct answers from the _id index in one reply, without a cursor of documents
+        return set(self.characters_collection.distinct("_id"))
 
-    def create_character(self):
+    def create_character(self, pools: dict = None, existing_ids: set = None):
         """
         Generates a new unique character, saves it to the database,
         and initializes relationships with existing characters.
+
+        Args:
+            pools: Attribute pools as returned by _load_attribute_pools; loaded if omitted
+            existing_ids: Ids of existing characters; read from the DB if omitted.
+                The new character's id is added to it.
+        """
+        if pools is None:
+            pools = self._load_attribute_pools()
+        if existing_ids is None:
+            existing_ids = self._load_character_ids()
+        return self._create_batch(1, pools, existing_ids)[0]
+
+    def _create_batch(self, count: int, pools: dict, existing_ids: set) -> list:
+        """
+        Generates count characters in memory, saves them, then links every new
+        character with all existing ones and with each other in one insert_many
+        on the relationships collection. Existing character documents are not
+        touched, so the cost doesn't grow with the size of the cast.
+        """
+        stored_ids = list(existing_ids)
+        new_characters = self._generate_characters(pools, existing_ids, count)
+        if not new_characters:
+            return new_characters
+
+        self._insert_characters(new_characters, pools, existing_ids)
+
+        # One document per direction of every new pair, holding that side's affinity
+        batch_ids = [c["_id"] for c in new_characters]
+        new_relationships = [
+            {
+                "char1_id": owner_id,
+                "char2_id": target_id,
+                "affinity_score": 0.0,
+                "interaction_history": []
+            }
+            for i, char_id in enumerate(batch_ids)
+            for other_id in stored_ids + batch_ids[:i]
+            for owner_id, target_id in ((char_id, other_id), (other_id, char_id))
+        ]
+        if new_relationships:
+            self.relationships_collection.insert_many(new_relationships, ordered=False)
+
+        # Returned documents carry their relationships like loaded characters do
+        all_ids = stored_ids + batch_ids
+        for doc in new_characters:
+            doc["relationships"] = {other_id: 0.0 for other_id in all_ids if other_id != doc["_id"]}
+
+        # The cast changed, so every cached prompt skeleton is stale
+        self.reset_cast()
+
+        return new_characters
+
+    def _insert_characters(self, characters: list, pools: dict, existing_ids: set):
+        """
+        Inserts new characters and lets the unique _id index detect ids taken
+        since existing_ids was read, instead of checking each id beforehand.
+        Characters that hit a duplicate key are regenerated in place in
+        characters and retried.
+        """
+        pending = characters
+        while pending:
+            try:
+                self.characters_collection.insert_many(pending, ordered=False)
+                return
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if not errors or any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                    raise
+                failed = [pending[err["index"]] for err in errors]
+
+            replacements = [self._generate_character(pools, existing_ids) for _ in failed]
+            for old_doc, new_doc in zip(failed, replacements):
+                characters[characters.index(old_doc)] = new_doc
+            pending = replacements
+
+    async def _load_relationships(self, character_id: str) -> dict:
+        """Returns the character's affinities as a dict of other character id -> score."""
+        docs = await self.relationships_async.find(
+            {"char1_id": character_id},
+            {"_id": 0, "char2_id": 1, "affinity_score": 1}
+        )
+        return {doc["char2_id"]: doc.get("affinity_score", 0.0) for doc in docs}
+
+    async def _get_character(self, character_id: str):
+        """Fetches a character together with its relationships, or None if it doesn't exist."""
+        character, relationships = await asyncio.gather(
+            self.characters_async.find_one({"_id": character_id}),
+            self._load_relationships(character_id)
+        )
+        if character:
+            character["relationships"] = relationships
+        return character
+
+    async def _load_turn(self, character_id: str, conversation_oid: ObjectId):
+        """
+        Fetches everything a turn in an existing conversation needs in a single
+        aggregate on conversations: the summary, the last 10 messages (shaped
+        for the prompt, oldest first), the character and its relationships.
+        Returns None if the conversation doesn't exist; "character" is None if
+        the character doesn't.
+        """
+        docs = await self.conversations_async.aggregate([
+            {"$match": {"_id": conversation_oid}},
+            {"$project": {"summary": 1}},
+            {"$lookup": {
+                "from": "messages",
+                "pipeline": [
+                    {"$match": {"conversation_id": str(conversation_oid)}},
+                    {"$sort": {"timestamp": -1}},
+                    {"$limit": 10},
+                    {"$sort": {"timestamp": 1}},
+                    _PROMPT_MESSAGE_STAGE,
+                ],
+                "as": "recent_messages"
+            }},
+            {"$lookup": {
+                "from": "characters",
+                "pipeline": [{"$match": {"_id": character_id}}],
+                "as": "character"
+            }},
+            {"$lookup": {
+                "from": "relationships",
+                "pipeline": [
+                    {"$match": {"char1_id": character_id}},
+                    {"$project": {"_id": 0, "char2_id": 1, "affinity_score": 1}},
+                ],
+                "as": "relationships"
+            }},
+        ])
+        if not docs:
+            return None
+
+        turn = docs[0]
+        character = turn["character"][0] if turn["character"] else None
+        if character:
+            character["relationships"] = {
+                doc["char2_id"]: doc.get("affinity_score", 0.0) for doc in turn["relationships"]
+            }
+        turn["character"] = character
+        return turn
+
+    def _relationship_writes(self, character: dict, updated: dict) -> list:
+        """
+        Upserts for the affinities in updated that differ from the character's
+        current ones. Ids of unknown characters and non-numeric scores are ignored.
         """
-        # 1. Fetch attribute pools from DB
-        pool_docs = self.attribute_pools_collection.find({})
-        pools = {doc["_id"]: doc["values"] for doc in pool_docs}
+        if not isinstance(updated, dict):
+            return []
+        known_ids = {c["_id"] for c in self._roster or ()} or set(character["relationships"])
+        writes = []
+        for other_id, score in updated.items():
+            if other_id == character["_id"] or other_id not in known_ids:
+                continue
+            try:
+                score = float(score)
+            except (TypeError, ValueError):
+                continue
+            if character["relationships"].get(other_id) != score:
+                writes.append(UpdateOne(
+                    {"char1_id": character["_id"], "char2_id": other_id},
+                    {"$set": {"affinity_score": score}},
+                    upsert=True
+                ))
+        return writes
 
+    def _generate_characters(self, pools: dict, existing_ids: set, count: int) -> list:
+        """
+        Builds count character documents with ids not in existing_ids, and reserves
+        those ids. Attributes for the whole batch are drawn at once with NumPy;
+        characters whose id collides are redrawn one at a time.
+        """
+        personalities = _sample_each(pools.get("personality_pool", []), count, 2, 3)
+        backgrounds = _choose_each(pools.get("background_pool", []), count)
+        traits = _sample_each(pools.get("trait_pool", []), count, 2, 4)
+        ethnicities = _choose_each(pools.get("ethnicity_pool", []), count)
+        religions = _choose_each(pools.get("religion_pool", []), count)
+        mental_illnesses = _sample_each(pools.get("mental_illness_pool", []), count, 0, 2)
+        subconscious_traits = _sample_each(pools.get("subconscious_trait_pool", []), count, 1, 2)
+        voice_types = _choose_each(pools.get("voice_pool", []), count)
+        iqs = _rng.integers(80, 141, size=(count, 2)).tolist()
+
+        characters = []
+        for i in range(count):
+            name = f"{' '.join(personalities[i])} {backgrounds[i]}".title()
+            char_id = slugify(name)
+            if char_id in existing_ids:
+                characters.append(self._generate_character(pools, existing_ids))
+                continue
+
+            existing_ids.add(char_id)
+            characters.append({
+                "_id": char_id,
+                "name": name,
+                "personality": personalities[i],
+                "background": backgrounds[i],
+                "traits": traits[i],
+                "voice_type": voice_types[i],
+                "ethnicity": ethnicities[i],
+                "religion": religions[i],
+                "mental_illness": mental_illnesses[i],
+                "subconscious_traits": subconscious_traits[i],
+                "mood": "neutral",
+                "technical_iq": iqs[i][0],
+                "general_iq": iqs[i][1]
+            })
+        return characters
+
+    def _generate_character(self, pools: dict, existing_ids: set) -> dict:
+        """Builds a character document with an id not in existing_ids, and reserves that id."""
         # Default to empty lists if any pool is missing
         personality_pool = pools.get("personality_pool", [])
         background_pool = pools.get("background_pool", [])
@@ -57,9 +453,7 @@ class CharacterEngine:
         mental_illness_pool = pools.get("mental_illness_pool", [])
         subconscious_trait_pool = pools.get("subconscious_trait_pool", [])
 
-        # 2. Generate a unique character
-        character_doc = None
-        while character_doc is None:
+        while True:
             personality = random.sample(personality_pool, k=random.randint(2, 3))
             background = random.choice(background_pool)
             traits = random.sample(trait_pool, k=random.randint(2, 4))
@@ -72,8 +466,9 @@ class CharacterEngine:
             name = f"{' '.join(personality)} {background}".title()
             char_id = slugify(name)
 
-            if self.characters_collection.find_one({"_id": char_id}) is None:
-                character_doc = {
+            if char_id not in existing_ids:
+                existing_ids.add(char_id)
+                return {
                     "_id": char_id,
                     "name": name,
                     "personality": personality,
@@ -85,130 +480,58 @@ class CharacterEngine:
                     "mental_illness": mental_illness,
                     "subconscious_traits": subconscious_traits,
                     "mood": "neutral",
-                    "relationships": {},
                     "technical_iq": random.randint(80, 140),
                     "general_iq": random.randint(80, 140)
                 }
 
-        # 3. Initialize relationships with existing characters
-        existing_char_ids = [c["_id"] for c in self.characters_collection.find({}, {"_id": 1})]
-        new_relationships = []
-        for existing_id in existing_char_ids:
-            # Update existing character's view of new one
-            self.characters_collection.update_one(
-                {"_id": existing_id},
-                {"$set": {f"relationships.{character_doc['_id']}": 0.0}}
-            )
-            # Add reciprocal relationship
-            character_doc["relationships"][existing_id] = 0.0
-            new_relationships.append({
-                "char1_id": character_doc['_id'],
-                "char2_id": existing_id,
-                "affinity_score": 0.0,
-                "interaction_history": []
-            })
-
-        if new_relationships:
-            self.relationships_collection.insert_many(new_relationships)
-
-        # 4. Save new character to DB
-        self.characters_collection.insert_one(character_doc)
-
-        return character_doc
-
     async def interact(self, character_id: str, text: str, conversation_id: str = None):
         """
         Handles interaction with a character using JSON-based RAG.
         """
-        # 1. Get character data from DB.
-        character = self.characters_collection.find_one({"_id": character_id})
-        if not character:
-            return {"error": "Character not found."}
+        # When the player spoke; also stamps a conversation created for this turn
+        received_at = datetime.now(timezone.utc)
 
-        # 2. Get or create conversation.
+        # 1-2. Get character data and the conversation (or create one).
+        # The id is parsed once; internal calls take the ObjectId
         if conversation_id:
-            conversation = self.conversations_collection.find_one({"_id": ObjectId(conversation_id)})
-            if not conversation:
+            conversation_oid = ObjectId(conversation_id)
+            turn = await self._load_turn(character_id, conversation_oid)
+            character = turn["character"] if turn else await self._get_character(character_id)
+            if not character:
+                return {"error": "Character not found."}
+            if not turn:
                 return {"error": "Conversation not found."}
+            recent_messages = turn["recent_messages"]
+            conversation_summary = turn.get("summary", "No summary yet.")
         else:
+            character = await self._get_character(character_id)
+            if not character:
+                return {"error": "Character not found."}
+
             conversation_doc = {
-                "timestamp": datetime.utcnow(),
+                "timestamp": received_at,
                 "participants": ["player", character_id],
                 "messages": [],
+                "message_count": 0,
                 "context": {},
                 "summary": ""
             }
-            result = self.conversations_collection.insert_one(conversation_doc)
-            conversation_id = str(result.inserted_id)
-            conversation = conversation_doc
-            conversation["_id"] = result.inserted_id
-        
-        # 3. Retrieve relevant context and construct prompt as JSON
-        prompt = await self._build_prompt(character, text, conversation_id)
+            result = await self.conversations_async.insert_one(conversation_doc)
+            conversation_oid = result.inserted_id
+            conversation_id = str(conversation_oid)
+            # A new conversation has no history yet
+            recent_messages = []
+            conversation_summary = conversation_doc["summary"]
         
-        # 4. Define JSON schema for response validation
-        response_schema = {
-            "type": "object",
-            "properties": {
-                "name": {
-                    "type": "string",
-                    "description": "Character name"
-                },
-                "personality": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Character personality traits"
-                },
-                "mood": {
-                    "type": "string",
-                    "description": "Current mood of the character"
-                },
-                "dialogue": {
-                    "type": "string",
-                    "description": "Character's spoken dialogue in response to the player"
-                },
-                "emotion": {
-                    "type": "string",
-                    "description": "Current emotional state during this dialogue"
-                },
-                "action": {
-                    "type": "string",
-                    "description": "Any physical action the character takes"
-                },
-                "memory_note": {
-                    "type": "string",
-                    "description": "Internal thought or memory to record"
-                },
-                "choices": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Possible player interaction choices"
-                },
-                "relationships": {
-                    "type": "object",
-                    "additionalProperties": {"type": "number"},
-                    "description": "Character's relationships with other characters"
-                },
-                "traits": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Character traits"
-                },
-                "subconscious_traits": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Character's hidden subconscious traits"
-                }
-            },
-            "required": ["name", "dialogue", "emotion"]
-        }
+        # 3. Construct prompt as JSON
+        prompt = await self._build_prompt(character, text, recent_messages, conversation_summary)
         
         # 5. Get LLM response with JSON format and schema validation
         llm_response = await self.llm_handler.get_response(
             prompt, 
             model="gemma3:4b", 
             json_format=True,
-            schema=response_schema
+            schema_str=_RESPONSE_SCHEMA_STR
         )
         
         if not llm_response:
@@ -240,17 +563,19 @@ class CharacterEngine:
         updated_traits = llm_response.get("traits", character.get("traits", []))
         updated_subconscious = llm_response.get("subconscious_traits", character.get("subconscious_traits", []))
 
-        # 8. Store messages in database (JSON format for context_tags)
+        # 8. Build message documents (JSON format for context_tags).
+        # Ids are assigned client-side so the conversation update below
+        # doesn't have to wait for the inserts to return them.
         player_message_doc = {
+            "_id": ObjectId(),
             "conversation_id": conversation_id,
-            "timestamp": datetime.utcnow(),
+            "timestamp": received_at,
             "speaker_type": "player",
             "speaker_id": "player",
             "content": text,
             "emotion": "n/a",
             "context_tags": []
         }
-        player_message_result = self.messages_collection.insert_one(player_message_doc)
 
         # Create context tags as JSON objects
         context_tags = []
@@ -260,42 +585,64 @@ class CharacterEngine:
             context_tags.append({"type": "memory_note", "value": memory_note})
         
         character_message_doc = {
+            "_id": ObjectId(),
             "conversation_id": conversation_id,
-            "timestamp": datetime.utcnow(),
+            "timestamp": datetime.now(timezone.utc),
             "speaker_type": "character",
             "speaker_id": character_id,
             "content": dialogue,
             "emotion": emotion,
             "context_tags": context_tags
         }
-        character_message_result = self.messages_collection.insert_one(character_message_doc)
-
-        # 9. Update conversation with new message IDs and update summary
-        self.conversations_collection.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {"$push": {"messages": {"$each": [player_message_result.inserted_id, character_message_result.inserted_id]}}}
-        )
-        
-        # 10. Asynchronously update the conversation summary in JSON format
-        asyncio.create_task(self._update_conversation_summary(conversation_id))
 
-        # 11. Update character with all returned data
         character_updates = {
             "mood": new_mood,
-            "relationships": updated_relationships,
             "traits": updated_traits,
             "subconscious_traits": updated_subconscious
         }
-        self.characters_collection.update_one({"_id": character_id}, {"$set": character_updates})
+        relationship_writes = self._relationship_writes(character, updated_relationships)
+
+        # 9. Store messages, link them to the conversation, update the character
+        # and synthesize audio concurrently; none of these depend on each other.
+        # Both messages go to the same collection, so they share one insert.
+        # The conversation keeps a running message count, returned by the same
+        # update, so the summary trigger below needs no count of the messages.
+        writes = [
+            self.messages_async.insert_many([player_message_doc, character_message_doc]),
+            self.conversations_async.find_one_and_update(
+                {"_id": conversation_oid},
+                {
+                    "$push": {"messages": {"$each": [player_message_doc["_id"], character_message_doc["_id"]]}},
+                    "$inc": {"message_count": 2}
+                },
+                projection={"_id": 0, "message_count": 1},
+                return_document=ReturnDocument.AFTER
+            ),
+            self.characters_async.update_one(
+                {"_id": character_id},
+                {"$set": character_updates}
+            ),
+            # Named after the character message, so every turn gets its own file
+            self.tts_handler.synthesize_async(
+                dialogue, os.path.join(settings.AUDIO_DIR, f"{character_message_doc['_id']}.wav")
+            )
+        ]
+        if relationship_writes:
+            writes.append(self.relationships_async.bulk_write(relationship_writes, ordered=False))
+        results = await asyncio.gather(*writes)
+        audio_path = results[3]
 
-        # 12. Synthesize audio response
-        audio_path = self.tts_handler.synthesize(dialogue, character.get("voice_type"))
+        # 10. Asynchronously update the conversation summary once the messages are
+        # stored, each time the count crosses a multiple of SUMMARY_INTERVAL
+        message_count = (results[1] or {}).get("message_count", 0)
+        if message_count // SUMMARY_INTERVAL > (message_count - 2) // SUMMARY_INTERVAL:
+            self._schedule_summary(conversation_oid)
 
         # 13. Return response as JSON
         return {
             "dialogue": dialogue,
             "audio_path": audio_path,
-            "conversation_id": str(conversation_id),
+            "conversation_id": conversation_id,
             "character_state": {
                 "mood": new_mood,
                 "emotion": emotion,
@@ -308,30 +655,77 @@ class CharacterEngine:
             "memory_note": memory_note
         }
         
-    async def _update_conversation_summary(self, conversation_id: str):
+    def _schedule_summary(self, conversation_oid: ObjectId):
+        """
+        Starts a summary update for the conversation in the background. While one
+        is running, further requests are coalesced into a single rerun once it
+        finishes, so turns never race each other to write the summary.
+        """
+        if conversation_oid in self._summary_tasks:
+            self._summary_rerun.add(conversation_oid)
+            return
+        self._summary_tasks[conversation_oid] = asyncio.create_task(self._run_summary_updates(conversation_oid))
+
+    async def _run_summary_updates(self, conversation_oid: ObjectId):
+        try:
+            while True:
+                self._summary_rerun.discard(conversation_oid)
+                await self._update_conversation_summary(conversation_oid)
+                if conversation_oid not in self._summary_rerun:
+                    break
+        finally:
+            self._summary_tasks.pop(conversation_oid, None)
+
+    async def _update_conversation_summary(self, conversation_oid: ObjectId):
         """
         Asynchronously updates the conversation summary using JSON format.
         """
-        # 1. Get conversation messages
-        messages = list(self.messages_collection.find(
-            {"conversation_id": conversation_id}
-        ).sort("timestamp", 1))
-        
-        if not messages:
+        # 1. Get the previous summary and a transcript of the most recent messages
+        # (oldest first). Only the last SUMMARY_WINDOW messages are read and they
+        # are joined into one string by MongoDB, so the cost per turn stays
+        # constant as the conversation grows.
+        docs = await self.conversations_async.aggregate([
+            {"$match": {"_id": conversation_oid}},
+            {"$project": {"summary": 1}},
+            {"$lookup": {
+                "from": "messages",
+                "pipeline": [
+                    {"$match": {"conversation_id": str(conversation_oid)}},
+                    {"$sort": {"timestamp": -1}},
+                    {"$limit": SUMMARY_WINDOW},
+                    {"$sort": {"timestamp": 1}},
+                    _SUMMARY_LINE_STAGE,
+                ],
+                "as": "lines"
+            }},
+            {"$project": {
+                "_id": 0,
+                "summary": 1,
+                "count": {"$size": "$lines"},
+                "transcript": {"$reduce": {
+                    "input": "$lines.line",
+                    "initialValue": "",
+                    "in": {"$concat": [
+                        "$$value",
+                        {"$cond": [{"$eq": ["$$value", ""]}, "", "\n"]},
+                        "$$this",
+                    ]},
+                }},
+            }},
+        ])
+
+        if not docs or not docs[0]["count"]:
             return
-            
-        # 2. Format messages for summarization
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                "speaker_id": msg.get('speaker_id'),
-                "content": msg.get('content'),
-                "emotion": msg.get('emotion', 'neutral')
-            })
-        
+
+        # 2. Older messages are represented by the summary written for them
+        transcript = docs[0]["transcript"]
+        previous_summary = docs[0].get("summary")
+        if previous_summary and docs[0]["count"] == SUMMARY_WINDOW:
+            transcript = f"previous_summary: {previous_summary}\n{transcript}"
+
         # 3. Generate JSON summary
         summary = await self.llm_handler.summarize_conversation(
-            formatted_messages, 
+            transcript,
             json_format=True
         )
         
@@ -340,8 +734,8 @@ class CharacterEngine:
             
         # 4. Update conversation with summary
         summary_text = summary.get("summary", "")
-        self.conversations_collection.update_one(
-            {"_id": ObjectId(conversation_id)},
+        await self.conversations_async.update_one(
+            {"_id": conversation_oid},
             {"$set": {
                 "summary": summary_text,
                 "context.summary_data": summary
@@ -353,45 +747,20 @@ class CharacterEngine:
         Allows the director to observe a character from an external perspective using JSON-based RAG.
         """
         # 1. Get character data from DB
-        character = self.characters_collection.find_one({"_id": character_id})
+        character = await self._get_character(character_id)
         if not character:
             return {"error": "Character not found."}
 
         # 2. Build observation prompt in JSON structure
         prompt = await self._build_observation_prompt(character, observation_type, context)
         
-        # 3. Define JSON schema for response validation
-        observation_schema = {
-            "type": "object",
-            "properties": {
-                "observation": {
-                    "type": "string",
-                    "description": "Detailed observation of the character's current state and behavior"
-                },
-                "character_state": {
-                    "type": "string",
-                    "description": "A brief descriptor of the character's current emotional/mental state"
-                },
-                "director_insights": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Analysis and insights for the director about this character"
-                },
-                "suggested_actions": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Potential actions the director could take regarding this character"
-                }
-            },
-            "required": ["observation", "character_state", "director_insights"]
-        }
         
         # 4. Get LLM response with JSON input/output
         llm_response = await self.llm_handler.get_response(
             prompt, 
             model="gemma3:4b", 
             json_format=True,
-            schema=observation_schema
+            schema_str=_OBSERVATION_SCHEMA_STR
         )
         
         if not llm_response:
@@ -408,7 +777,7 @@ class CharacterEngine:
 
         # 6. Log the observation as JSON
         observation_doc = {
-            "timestamp": datetime.utcnow(),
+            "timestamp": datetime.now(timezone.utc),
             "observer": "DIRECTOR",
             "character_id": character_id,
             "observation_type": observation_type,
@@ -420,7 +789,7 @@ class CharacterEngine:
                 "suggested_actions": llm_response.get("suggested_actions", [])
             }
         }
-        self.messages_collection.insert_one(observation_doc)
+        await self.messages_async.insert_one(observation_doc)
 
         # 7. Return the observation data as JSON
         return {
@@ -431,39 +800,35 @@ class CharacterEngine:
             "character_name": character["name"]
         }
         
-    async def _build_observation_prompt(self, character: dict, observation_type: str, context: str) -> dict:
-        """Builds JSON-structured prompts for director character observations."""
+    async def _build_observation_prompt(self, character: dict, observation_type: str, context: str) -> str:
+        """Builds JSON-encoded prompts for director character observations."""
         
-        # Get recent character activity
-        recent_messages = list(self.messages_collection.find(
-            {"speaker_id": character["_id"]}
-        ).sort("timestamp", -1).limit(5))
-
-        # Format messages for JSON
-        formatted_messages = []
-        for msg in recent_messages:
-            formatted_messages.append({
-                "speaker_id": msg.get('speaker_id'),
-                "content": msg.get('content'),
-                "emotion": msg.get('emotion', 'neutral'),
-                "timestamp": str(msg.get('timestamp'))
-            })
-
-        # Get relationship context
-        all_other_characters = self.characters_collection.find({"_id": {"$ne": character["_id"]}})
-        other_char_list = list(all_other_characters)
+        # Get recent character activity and relationship context concurrently;
+        # messages come back already shaped for the prompt
+        formatted_messages, other_char_list = await asyncio.gather(
+            self.messages_async.aggregate([
+                {"$match": {"speaker_id": character["_id"]}},
+                {"$sort": {"timestamp": -1}},
+                {"$limit": 5},
+                _PROMPT_MESSAGE_STAGE,
+            ]),
+            self.get_cast()
+        )
         
-        relationships_data = []
-        for other_char in other_char_list:
-            affinity = character.get("relationships", {}).get(other_char["_id"], 0.0)
-            relationships_data.append({
-                "id": other_char.get("_id"),
+        rels = character.get("relationships") or {}
+        relationships_data = [
+            {
+                "id": other_char["_id"],
                 "name": other_char.get("name"),
-                "affinity": affinity
-            })
+                "affinity": rels.get(other_char["_id"], 0.0)
+            }
+            for other_char in other_char_list
+            if other_char["_id"] != character["_id"]
+        ]
         
-        # Build the base prompt structure as JSON
-        base_prompt = {
+        # Encode everything but the instructions, which are pre-encoded per type,
+        # and splice them in place of the closing brace
+        base_prompt = orjson.dumps({
             "role": "director",
             "character": {
                 "id": character.get("_id"),
@@ -480,123 +845,124 @@ class CharacterEngine:
                 "general_iq": character.get("general_iq", 100)
             },
             "context": {
-                "setting": "Voice Island reality TV show",
+                "setting": PROMPT_SETTING,
                 "observation_type": observation_type,
                 "additional_context": context,
                 "recent_activity": formatted_messages,
                 "relationships": relationships_data
-            },
-            "instructions": {
-                "task": f"Generate {observation_type} observation",
-                "response_format": "JSON",
-                "response_structure": {
-                    "observation": "detailed_observation_text",
-                    "character_state": "emotional_mental_state",
-                    "director_insights": ["insight1", "insight2", "insight3"],
-                    "suggested_actions": ["possible_action1", "possible_action2"]
-                }
             }
-        }
-        
-        # Add observation type specific instructions
-        if observation_type == "general":
-            base_prompt["instructions"]["description"] = "Observe the character's general behavior and state"
-        elif observation_type == "private_thoughts":
-            base_prompt["instructions"]["description"] = "Reveal the character's inner thoughts and feelings"
-        elif observation_type == "interaction":
-            base_prompt["instructions"]["description"] = "Analyze the character's behavior in a specific interaction"
-        
-        return base_prompt
+        })
+        return b"".join((
+            base_prompt[:-1],
+            b',"instructions":',
+            _observation_instructions(observation_type),
+            b"}"
+        )).decode()
         
-    async def _build_prompt(self, character: dict, player_input: str, conversation_id: str) -> dict:
-        """Builds the prompt for character responses as a JSON structure."""
-        # Retrieve recent messages
-        recent_messages_cursor = self.messages_collection.find(
-            {"conversation_id": conversation_id}
-        ).sort("timestamp", -1).limit(10)
-        recent_messages = list(recent_messages_cursor)
-        recent_messages.reverse()
-        
-        # Format messages for JSON
-        formatted_messages = []
-        for msg in recent_messages:
-            formatted_messages.append({
-                "speaker_id": msg.get('speaker_id'),
-                "content": msg.get('content'),
-                "emotion": msg.get('emotion', 'neutral'),
-                "timestamp": str(msg.get('timestamp'))
-            })
-        
-        # Get conversation summary
-        conversation = self.conversations_collection.find_one({"_id": ObjectId(conversation_id)})
-        conversation_summary = conversation.get("summary", "No summary yet.") if conversation else "No conversation found."
-
+    async def _build_prompt(self, character: dict, player_input: str, recent_messages: list, conversation_summary: str) -> str:
+        """
+        Builds the prompt for character responses as a JSON-encoded string.
+        recent_messages are prompt history entries as returned by _load_turn.
+        """
         # Determine prompt context
         context_prompt = "responding to player message"
         if player_input == "[Start Conversation]":
             context_prompt = "first confessional session"
 
-        # Get all other characters for relationship context
-        all_other_characters = self.characters_collection.find({"_id": {"$ne": character["_id"]}})
-        other_char_list = list(all_other_characters)
-        
-        other_characters_data = []
-        for other_char in other_char_list:
-            affinity = character.get("relationships", {}).get(other_char["_id"], 0.0)
-            other_characters_data.append({
-                "id": other_char.get("_id"),
+        # Only the per-turn fields are encoded; everything else comes pre-encoded
+        # from the skeleton and the module-level instructions
+        head, context_head, cast = await self._prompt_skeleton(character)
+        state = orjson.dumps({
+            "traits": character.get("traits", []),
+            "mood": character.get("mood", "neutral"),
+            "relationships": character.get("relationships", {}),
+            "subconscious_traits": character.get("subconscious_traits", [])
+        })
+        return b"".join((
+            head,
+            state[1:],
+            context_head,
+            orjson.dumps(context_prompt),
+            b',"player_input":',
+            orjson.dumps(player_input),
+            cast,
+            orjson.dumps(recent_messages),
+            b',"conversation_summary":',
+            orjson.dumps(conversation_summary),
+            b'},"instructions":',
+            _RESPONSE_INSTRUCTIONS,
+            b"}"
+        )).decode()
+
+    async def get_cast(self) -> list:
+        """
+        Returns the _id/name/personality/background of every character. Loaded
+        once and reused until the cast changes (see reset_cast); the list is
+        shared, so callers must not modify it.
+        """
+        if self._roster is None:
+            self._roster = await self.characters_async.find(
+                {}, {"name": 1, "personality": 1, "background": 1}
+            )
+        return self._roster
+
+    def reset_cast(self):
+        """Forgets the cached cast and prompt skeletons after characters were added or removed."""
+        self._roster = None
+        self._prompt_skeletons.clear()
+
+    async def _prompt_skeleton(self, character: dict) -> tuple:
+        """
+        Returns the pre-encoded parts of a character's prompt that don't change
+        between turns: the character object up to its per-turn state, the
+        context up to the current_context value, and the cast block. Mood,
+        traits and relationships change every turn and are encoded by
+        _build_prompt. Cached per character until the cast changes.
+        """
+        cached = self._prompt_skeletons.get(character["_id"])
+        if cached is not None:
+            return cached
+
+        # Affinities are per-turn state; they reach the prompt through the
+        # character's relationships, keyed by the ids listed here
+        other_characters_data = [
+            {
+                "id": other_char["_id"],
                 "name": other_char.get("name", "Unknown"),
                 "personality": other_char.get("personality", []),
-                "background": other_char.get("background", "Unknown"),
-                "affinity_score": affinity
-            })
-
-        # Build prompt as JSON structure
-        prompt = {
-            "role": "character",
-            "character": {
-                "id": character.get("_id"),
-                "name": character.get("name"),
-                "personality": character.get("personality", []),
-                "background": character.get("background", ""),
-                "traits": character.get("traits", []),
-                "mood": character.get("mood", "neutral"),
-                "relationships": character.get("relationships", {}),
-                "ethnicity": character.get("ethnicity", ""),
-                "religion": character.get("religion", ""),
-                "mental_illness": character.get("mental_illness", []),
-                "subconscious_traits": character.get("subconscious_traits", []),
-                "technical_iq": character.get("technical_iq", 100),
-                "general_iq": character.get("general_iq", 100)
-            },
-            "context": {
-                "setting": "Voice Island reality TV show",
-                "current_context": context_prompt,
-                "player_input": player_input,
-                "other_characters": other_characters_data,
-                "conversation_history": formatted_messages,
-                "conversation_summary": conversation_summary
-            },
-            "instructions": {
-                "task": "Generate in-character response",
-                "response_format": "JSON",
-                "response_structure": {
-                    "name": "character name",
-                    "personality": ["personality_traits"],
-                    "mood": "current_emotional_state",
-                    "dialogue": "character's spoken response (under 80 words)",
-                    "emotion": "specific_emotion_during_dialogue",
-                    "action": "any_physical_action_taken",
-                    "memory_note": "character's_internal_thoughts",
-                    "choices": ["possible_player_response1", "possible_player_response2", "possible_player_response3"],
-                    "relationships": {"character_id": "float_value"},
-                    "traits": ["character_traits"],
-                    "subconscious_traits": ["subconscious_traits"]
-                }
+                "background": other_char.get("background", "Unknown")
             }
-        }
-        
-        return prompt
+            for other_char in await self.get_cast()
+            if other_char["_id"] != character["_id"]
+        ]
+
+        static_fields = orjson.dumps({
+            "id": character.get("_id"),
+            "name": character.get("name"),
+            "personality": character.get("personality", []),
+            "background": character.get("background", ""),
+            "ethnicity": character.get("ethnicity", ""),
+            "religion": character.get("religion", ""),
+            "mental_illness": character.get("mental_illness", []),
+            "technical_iq": character.get("technical_iq", 100),
+            "general_iq": character.get("general_iq", 100)
+        })
+        skeleton = (
+            # Left open so the per-turn state object's fields follow
+            b"".join((b'{"role":"character","character":', static_fields[:-1], b",")),
+            b"".join((
+                b',"context":{"setting":',
+                orjson.dumps(PROMPT_SETTING),
+                b',"current_context":'
+            )),
+            b"".join((
+                b',"other_characters":',
+                orjson.dumps(other_characters_data),
+                b',"conversation_history":'
+            ))
+        )
+        self._prompt_skeletons[character["_id"]] = skeleton
+        return skeleton
 
     def _update_relationship(self, char1_id: str, char2_id: str, llm_response: dict):
         """Placeholder for relationship update logic."""
@@ -1,40 +1,26 @@
+import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+import orjson
 from bson.objectid import ObjectId
 
+from config import settings
 from storage.database.db_handler import db_handler
+from storage.database.cleanup import end_season
 from engine.logic.character_engine import CharacterEngine
 
-logger = logging.getLogger(__name__)
-
-class GameLoop:
-    def __init__(self):
-        self.character_engine = CharacterEngine()
-        self.messages_collection = db_handler.get_collection("messages")
-        self.conversations_collection = db_handler.get_collection("conversations")
-        self.is_running = False
-        logger.info("🎮 Game loop initialized under director control.")
-
-    async def start(self):
-        self.is_running = True
-        logger.info("🎬 New season launched. Awaiting cast setup via director interface.")
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
 
-    async def start_story(self, model: str):
-        logger.info(f"🚀 Generating season premiere with model `{model}`...")
-
-        characters = list(self.character_engine.characters_collection.find({}))
-        if not characters:
-            logger.warning("No characters in the database. Cannot start story.")
-            return {"dialogue": "Cannot start a story without any contestants.", "choices": [], "is_game_over": False}
-
-        character_descriptions = [
-            f"- **{char['name']}** aka {char['personality'][0]}: {char['background']}"
-            for char in characters
-        ]
-        character_list_str = "\n".join(character_descriptions)
+logger = logging.getLogger(__name__)
 
-        prompt = f"""
-You are a **structured narrator agent** for an AI-powered reality show simulation called **🎙️ Voice Island**.
+# Static parts of the director prompts. Role, requirements, output format and
+# rules are fixed and go out first, as the system message, so every request
+# starts with the same text and Ollama can reuse its cached evaluation. The
+# user message carries only what varies: the cast, story context and choice.
+_PREMIERE_SYSTEM = """You are a **structured narrator agent** for an AI-powered reality show simulation called **🎙️ Voice Island**.
 
 ---
 
@@ -49,11 +35,6 @@ Do NOT generate any narration or dialogue from characters not in the cast.
 
 ---
 
-## 👥 Cast (Contestants):
-{character_list_str}
-
----
-
 ## 🎬 Season Premiere Requirements:
 
 1. **Episode Title**: A dramatic title with emojis.
@@ -69,13 +50,13 @@ Do NOT generate any narration or dialogue from characters not in the cast.
 
 Return only a **valid JSON object** with this exact structure, Choice section is mandatory:
 
-{{
+{
   "title": "string (episode title with emojis)",
   "dialogue": [
-    {{
+    {
       "speaker": "Narrator | Character Name | Voice Island AI",
       "line": "string (markdown-formatted narration or dialogue)"
-    }},
+    },
     ...
   ],
   "choices": [
@@ -83,7 +64,7 @@ Return only a **valid JSON object** with this exact structure, Choice section is
     "string (director choice)",
     "string (director choice)"
   ]
-}}
+}
 
 ---
 
@@ -93,63 +74,246 @@ Return only a **valid JSON object** with this exact structure, Choice section is
 - Each entry must clearly specify `speaker` and `line`.
 - Do NOT include any code block formatting (e.g. no triple backticks or indentation).
 - No other output or commentary is allowed.
-- Do NOT invent extra data, characters, or formats.
+- Do NOT invent extra data, characters, or formats."""
+
+_PREMIERE_PROMPT_HEAD = """## 👥 Cast (Contestants):
+"""
+
+_PREMIERE_PROMPT_TAIL = """
 
 ---
 
 Now generate the **season premiere episode**.
 """
 
+_PROGRESS_SYSTEM = """You are a **story progression agent** for the AI reality show **🎙️ Voice Island**.
+
+---
+
+## 🧠 Role Instructions:
+- You may ONLY speak as **Narrator**, **Voice Island AI**, or **contestants** (must match the cast names).
+- Use their personality traits.
+- Reactions must directly follow the selected **Director’s Choice**.
+
+---
+
+## 📝 Task:
+Generate the next scene in JSON. Include:
+1. 3–5 lines of dramatic interaction (Narrator, 2–3 contestants, optional AI line).
+2. 3–4 new choices.
+3. End condition flag.
+
+---
+
+## 🔐 JSON Output Format (STRICT):
+
+{
+  "scene": [
+    { "speaker": "Narrator | Character Name | Voice Island AI", "line": "string", "emotion": "optional" },
+    ...
+  ],
+  "choices": [
+    "string (director choice)",
+    "string (director choice)",
+    "string (director choice)"
+  ],
+  "is_game_over": boolean
+}
+
+---
+
+## ✅ Rules:
+- Do not add extra metadata.
+- No code blocks or markdown formatting.
+- No outside commentary."""
+
+_PROGRESS_PROMPT_HEAD = """## 👥 Cast:
+"""
+
+_PROGRESS_PROMPT_CONTEXT = """
+
+---
+
+## 🎞️ Context:
+"""
+
+_PROGRESS_PROMPT_CHOICE = """
+
+---
+
+## 🎮 Director’s Selected Choice:
+"""
+
+_PROGRESS_PROMPT_TAIL = """
+
+---
+
+Now continue the story from the Director’s choice.
+"""
+
+# Shapes of the director responses; the handlers index speaker/line directly
+_LINE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "speaker": {"type": "string"},
+        "line": {"type": "string"},
+        "emotion": {"type": "string"}
+    },
+    "required": ["speaker", "line"]
+}
+
+_CHOICES_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+PREMIERE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "dialogue": {"type": "array", "items": _LINE_SCHEMA},
+        "choices": _CHOICES_SCHEMA
+    },
+    "required": ["dialogue"]
+}
+
+SCENE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scene": {"type": "array", "items": _LINE_SCHEMA},
+        "choices": _CHOICES_SCHEMA,
+        "is_game_over": {"type": "boolean"}
+    },
+    "required": ["scene"]
+}
+
+def _compile_validator(schema: dict):
+    """
+    Returns a function telling whether an LLM response matches schema, compiled
+    once with fastjsonschema. Without it only the top-level type is checked.
+    """
+    if fastjsonschema is None:
+        return lambda data: isinstance(data, dict)
+    validate = fastjsonschema.compile(schema)
+
+    def is_valid(data) -> bool:
+        try:
+            validate(data)
+            return True
+        except fastjsonschema.JsonSchemaException as e:
+            logger.warning("LLM response failed validation: %s", e.message)
+            return False
+    return is_valid
+
+_is_valid_premiere = _compile_validator(PREMIERE_SCHEMA)
+_is_valid_scene = _compile_validator(SCENE_SCHEMA)
+
+# Director choices that may run on settings.FAST_MODEL: short ones that don't
+# steer the story towards the end of the season
+_FAST_CHOICE_MAX_CHARS = 120
+_FINALE_HINTS = ("final", "winner", "eliminat", "end the season", "last episode")
+
+def _is_low_stakes(director_choice: str) -> bool:
+    """Tells whether a director choice is short and doesn't point at the finale."""
+    choice = director_choice.lower()
+    return len(choice) <= _FAST_CHOICE_MAX_CHARS and not any(hint in choice for hint in _FINALE_HINTS)
+
+class GameLoop:
+    def __init__(self):
+        self.character_engine = CharacterEngine()
+        # Awaitable views of the collections the story is written to
+        self.messages_async = db_handler.get_async_collection("messages")
+        self.conversations_async = db_handler.get_async_collection("conversations")
+        self.is_running = False
+        # Latest director narrative block; kept current by _log_narrative
+        self._last_narrative = None
+        # Progression prompt cast block and the character ids it was built for
+        self._cast_ids = None
+        self._cast_block = ""
+        logger.info("🎮 Game loop initialized under director control.")
+
+    async def start(self):
+        self.is_running = True
+        logger.info("🎬 New season launched. Awaiting cast setup via director interface.")
+
+    async def start_story(self, model: str):
+        logger.info("🚀 Generating season premiere with model `%s`...", model)
+
+        # The cast only changes through the character engine, which caches it
+        characters = await self.character_engine.get_cast()
+        if not characters:
+            logger.warning("No characters in the database. Cannot start story.")
+            return {"dialogue": "Cannot start a story without any contestants.", "choices": [], "is_game_over": False}
+
+        character_descriptions = [
+            f"- **{char['name']}** aka {char['personality'][0]}: {char['background']}"
+            for char in characters
+        ]
+        character_list_str = "\n".join(character_descriptions)
+
+        prompt = _PREMIERE_PROMPT_HEAD + character_list_str + _PREMIERE_PROMPT_TAIL
+
         response_data = await self.character_engine.llm_handler.get_response(
-            prompt, model=model, json_format=True
+            prompt, model=model, json_format=True, system=_PREMIERE_SYSTEM,
+            validate=_is_valid_premiere
         )
 
-        if isinstance(response_data, dict):
+        # One timestamp for the whole premiere; _id keeps the lines in order
+        now = datetime.now(timezone.utc)
+        if _is_valid_premiere(response_data):
             title = response_data.get("title", "The Premiere")
             dialogue_list = response_data.get("dialogue", [])
             choices = response_data.get("choices", [])
 
             conversation_id = str(ObjectId())
-            self.conversations_collection.insert_one({
+            conversation = {
                 "_id": conversation_id,
-                "timestamp": datetime.utcnow(),
+                "timestamp": now,
                 "participants": [char["_id"] for char in characters] + ["NARRATOR", "Voice Island AI"],
                 "context": {"title": title}
-            })
+            }
 
-            for item in dialogue_list:
-                self.messages_collection.insert_one({
+            messages = [
+                {
                     "conversation_id": conversation_id,
-                    "timestamp": datetime.utcnow(),
+                    "timestamp": now,
                     "speaker_type": "character" if item['speaker'] not in ["Narrator", "Voice Island AI"] else "system",
                     "speaker_id": item['speaker'],
                     "content": item['line'],
                     "emotion": "dramatic",
-                })
+                }
+                for item in dialogue_list
+            ]
 
             log_dialogue = f"# {title}\n" + "\n".join([
                 f"**{item['speaker']}**: {item['line']}"
                 for item in dialogue_list
             ])
 
-            self.messages_collection.insert_one({
-                "conversation_id": conversation_id,
-                "timestamp": datetime.utcnow(),
-                "speaker_type": "system",
-                "speaker_id": "NARRATOR",
-                "content": log_dialogue,
-                "choices": choices,
-                "emotion": "dramatic",
-                "director_control": True,
-                "is_game_over": False
-            })
+            # The conversation and its messages live in separate collections
+            await asyncio.gather(
+                self.conversations_async.insert_one(conversation),
+                self._log_narrative({
+                    "conversation_id": conversation_id,
+                    "timestamp": now,
+                    "speaker_type": "system",
+                    "speaker_id": "NARRATOR",
+                    "content": log_dialogue,
+                    "choices": choices,
+                    "emotion": "dramatic",
+                    "director_control": True,
+                    "is_game_over": False
+                }, messages)
+            )
 
             return {"title": title, "dialogue": dialogue_list, "choices": choices, "is_game_over": False}
 
-        fallback = str(response_data) if response_data else "Invalid LLM response."
-        self.messages_collection.insert_one({
+        if not response_data:
+            fallback = "Invalid LLM response."
+        elif isinstance(response_data, str):
+            fallback = response_data
+        else:
+            fallback = orjson.dumps(response_data, option=orjson.OPT_INDENT_2).decode()
+        await self._log_narrative({
             "conversation_id": "SYSTEM_SEASON_START_ERROR",
-            "timestamp": datetime.utcnow(),
+            "timestamp": now,
             "speaker_type": "system",
             "speaker_id": "NARRATOR",
             "content": fallback,
@@ -161,114 +325,68 @@ Now generate the **season premiere episode**.
         return {"dialogue": fallback, "choices": [], "is_game_over": False}
 
     async def progress_story(self, director_choice: str, model: str):
-        characters = list(self.character_engine.characters_collection.find({}))
+        # Low-stakes turns may run on a smaller model; the premiere and the
+        # finale are written with the director's model
+        turn_model = settings.FAST_MODEL if settings.FAST_MODEL and _is_low_stakes(director_choice) else model
+
+        # The cast only changes through the character engine, which caches it
+        characters, last_block = await asyncio.gather(
+            self.character_engine.get_cast(), self._latest_narrative()
+        )
         if not characters:
             return {"dialogue": "Cannot progress the story without any contestants.", "choices": []}
 
-        character_descriptions = [f"- **{char['name']}** ({', '.join(char['personality'])}, {char['background']})" for char in characters]
-        character_list_str = "\n".join(character_descriptions)
+        character_list_str = self._cast_list(characters)
 
-        last_block = self.messages_collection.find_one(
-            {"speaker_type": "system", "director_control": True},
-            sort=[("timestamp", -1)]
-        )
         story_context = last_block['content'][-700:] if last_block and 'content' in last_block else ""
         conversation_id = last_block.get('conversation_id') if last_block else None
 
-        prompt = f"""
-You are a **story progression agent** for the AI reality show **🎙️ Voice Island**.
-
----
-
-## 🧠 Role Instructions:
-- You may ONLY speak as **Narrator**, **Voice Island AI**, or **contestants** (must match the cast names).
-- Use their personality traits.
-- Reactions must directly follow the selected **Director’s Choice**.
-
----
-
-## 👥 Cast:
-{character_list_str}
-
----
-
-## 🎞️ Context:
-{story_context}
-
----
-
-## 🎮 Director’s Selected Choice:
-{director_choice}
-
----
-
-## 📝 Task:
-Generate the next scene in JSON. Include:
-1. 3–5 lines of dramatic interaction (Narrator, 2–3 contestants, optional AI line).
-2. 3–4 new choices.
-3. End condition flag.
-
----
-
-## 🔐 JSON Output Format (STRICT):
-
-{{
-  "scene": [
-    {{ "speaker": "Narrator | Character Name | Voice Island AI", "line": "string", "emotion": "optional" }},
-    ...
-  ],
-  "choices": [
-    "string (director choice)",
-    "string (director choice)",
-    "string (director choice)"
-  ],
-  "is_game_over": boolean
-}}
-
----
-
-## ✅ Rules:
-- Do not add extra metadata.
-- No code blocks or markdown formatting.
-- No outside commentary.
-
-Now continue the story from the Director’s choice.
-"""
+        # The rendered prompt fully determines the scene, so a retried choice on the
+        # same context is answered from LLMHandler's response cache without another LLM call
+        prompt = self._progress_prompt(character_list_str, story_context, director_choice)
 
-        response_data = await self.character_engine.llm_handler.get_response(
-            prompt, model=model, json_format=True
-        )
+        response_data = await self._request_scene(prompt, turn_model)
+        if turn_model != model and _is_valid_scene(response_data) and response_data.get("is_game_over"):
+            logger.info("Fast model ended the season; writing the finale with `%s` instead", model)
+            response_data = await self._request_scene(prompt, model)
 
-        if isinstance(response_data, dict):
+        # One timestamp for the whole scene; _id keeps the lines in order
+        now = datetime.now(timezone.utc)
+        if _is_valid_scene(response_data):
             scene = response_data.get("scene", [])
             choices = response_data.get("choices", [])
             is_game_over = response_data.get("is_game_over", False)
 
             if not conversation_id:
                 conversation_id = str(ObjectId())
-                self.conversations_collection.insert_one({
+                await self.conversations_async.insert_one({
                     "_id": conversation_id,
-                    "timestamp": datetime.utcnow(),
+                    "timestamp": now,
                     "participants": [char["_id"] for char in characters] + ["NARRATOR", "Voice Island AI"],
                     "context": {"title": "Story Progression"}
                 })
 
-            for item in scene:
-                self.messages_collection.insert_one({
+            messages = [
+                {
                     "conversation_id": conversation_id,
-                    "timestamp": datetime.utcnow(),
+                    "timestamp": now,
                     "speaker_type": "character" if item['speaker'] not in ["Narrator", "Voice Island AI"] else "system",
                     "speaker_id": item['speaker'],
                     "content": item['line'],
                     "emotion": item.get("emotion", "neutral"),
-                })
+                }
+                for item in scene
+            ]
             
             dialogue_to_return = scene
         else:
+            messages = []
             scene = []
             choices = []
             is_game_over = False
             dialogue_to_return = [{"speaker": "System", "line": "Invalid LLM response."}]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Invalid scene response:\n%s", orjson.dumps(response_data, option=orjson.OPT_INDENT_2).decode())
 
 
         if is_game_over:
@@ -279,9 +397,9 @@ Now continue the story from the Director’s choice.
             for m in scene
         ]) if scene else "No scene generated from LLM."
 
-        self.messages_collection.insert_one({
+        await self._log_narrative({
             "conversation_id": conversation_id or "SYSTEM_STORY_PROGRESS_ERROR",
-            "timestamp": datetime.utcnow(),
+            "timestamp": now,
             "speaker_type": "system",
             "speaker_id": "NARRATOR",
             "content": log_content,
@@ -290,54 +408,74 @@ Now continue the story from the Director’s choice.
             "director_control": True,
             "triggering_choice": director_choice,
             "is_game_over": is_game_over
-        })
+        }, messages)
 
         return {"dialogue": dialogue_to_return, "choices": choices, "is_game_over": is_game_over}
 
-    def get_story_history(self):
+    async def _request_scene(self, prompt: str, model: str):
+        """Asks the LLM for the next scene; only valid scenes are cached."""
+        return await self.character_engine.llm_handler.get_response(
+            prompt, model=model, json_format=True, system=_PROGRESS_SYSTEM,
+            validate=_is_valid_scene
+        )
+
+    def _cast_list(self, characters: list) -> str:
         """
-        Retrieves the full story history from the messages collection for the current season.
+        Returns the cast block of the progression prompt. It is rebuilt only when
+        the set of characters changes, so it stays identical across turns.
         """
-        latest_conv = self.conversations_collection.find_one(sort=[("timestamp", -1)])
-        if not latest_conv:
-            return {"dialogue": [], "choices": []}
-        
-        conv_id = latest_conv["_id"]
-        
-        messages = self.messages_collection.find(
-            {
-                "conversation_id": conv_id,
-                "director_control": {"$ne": True}
-            },
-            sort=[("timestamp", 1)]
-        )
-        
-        dialogue = []
-        for msg in messages:
-            dialogue.append({
-                "speaker": msg.get("speaker_id"),
-                "line": msg.get("content"),
-                "emotion": msg.get("emotion")
-            })
-            
-        last_director_message = self.messages_collection.find_one(
-            {
-                "conversation_id": conv_id,
-                "director_control": True
-            },
-            sort=[("timestamp", -1)]
-        )
-        
-        choices = []
-        if last_director_message:
-            choices = last_director_message.get("choices", [])
-            
-        return {"dialogue": dialogue, "choices": choices}
+        ids = frozenset(char["_id"] for char in characters)
+        if ids != self._cast_ids:
+            self._cast_block = "\n".join(
+                f"- **{char['name']}** ({', '.join(char['personality'])}, {char['background']})"
+                for char in characters
+            )
+            self._cast_ids = ids
+        return self._cast_block
+
+    def _progress_prompt(self, character_list_str: str, story_context: str, director_choice: str) -> str:
+        """Builds the story progression prompt for one director choice."""
+        return "".join((
+            _PROGRESS_PROMPT_HEAD, character_list_str,
+            _PROGRESS_PROMPT_CONTEXT, story_context,
+            _PROGRESS_PROMPT_CHOICE, director_choice,
+            _PROGRESS_PROMPT_TAIL
+        ))
+
+    async def _log_narrative(self, doc: dict, messages: list = None):
+        """
+        Stores a director narrative block, preceded by the scene messages it
+        covers, in a single insert_many and remembers it as the latest block.
+        """
+        await self.messages_async.insert_many([*(messages or ()), doc], ordered=False)
+        self._last_narrative = doc
+
+    async def _latest_narrative(self):
+        """
+        Returns the latest director narrative block. Blocks are only written through
+        _log_narrative, so the database is queried only before the first one.
+        """
+        if self._last_narrative is None:
+            self._last_narrative = await self.messages_async.find_one(
+                {"director_control": True, "speaker_type": "system"},
+                sort=[("timestamp", -1)]
+            )
+        return self._last_narrative
 
     async def end_game(self):
-        """Ends the current game season."""
+        """
+        Ends the current game season and clears its data.
+        Returns True if the season data was cleared.
+        """
         self.is_running = False
+        cleared = await end_season()
+        self.character_engine.tts_handler.close()  # The game loop is discarded after this
+        # The cast and the story were dropped with the season data
+        self.character_engine.reset_cast()
+        self._cast_ids = None
+        self._last_narrative = None
         logger.info("Game loop stopped.")
+        return cleared
 
     def stop(self):
         self.is_running = False
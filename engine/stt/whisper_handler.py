@@ -1,15 +1,44 @@
-import whisper
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+if WhisperModel is None:
+    import whisper
 
 class WhisperHandler:
-    def __init__(self, model_size="base"):
+    def __init__(self, model_size="base", compute_type="int8"):
         """
-        Initializes the Whisper model.
+        Initializes the Whisper model. With faster-whisper installed the model
+        runs on CTranslate2 with int8 weights (compute_type); otherwise the
+        reference openai-whisper model is loaded.
         """
-        self.model = whisper.load_model(model_size)
+        if WhisperModel is not None:
+            self.model = WhisperModel(model_size, compute_type=compute_type, cpu_threads=os.cpu_count() or 0)
+        else:
+            self.model = whisper.load_model(model_size)
+        # A model must not run two transcriptions at once; one thread serializes them
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
 
     def transcribe(self, audio_file_path: str) -> str:
         """
         Transcribes an audio file to text.
         """
+        if WhisperModel is not None:
+            # Segments are decoded lazily while they are iterated
+            segments, _ = self.model.transcribe(audio_file_path)
+            return "".join(segment.text for segment in segments)
         result = self.model.transcribe(audio_file_path)
         return result["text"]
+
+    async def transcribe_async(self, audio_file_path: str) -> str:
+        """
+        Transcribes an audio file on the handler's worker thread, so the event
+        loop keeps serving other coroutines. Concurrent calls queue up.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.transcribe, audio_file_path)
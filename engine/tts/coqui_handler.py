@@ -1,14 +1,67 @@
 from TTS.api import TTS
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+import soundfile as sf
+import torch
+
+# Model instance owned by a synthesis worker process
+_worker_tts = None
+
+def _load_tts(model_name: str) -> TTS:
+    """Loads a model, on the GPU when CUDA is available."""
+    tts = TTS(model_name)
+    if torch.cuda.is_available():
+        tts = tts.to("cuda")
+    return tts
+
+@torch.inference_mode()
+def _synthesize(tts: TTS, text: str, output_path: str) -> str:
+    """
+    Runs inference without autograd bookkeeping and writes the waveform
+    directly, instead of going through tts_to_file's save path.
+    """
+    wav = tts.tts(text=text)
+    sf.write(output_path, wav, tts.synthesizer.output_sample_rate, format="WAV", subtype="PCM_16")
+    return output_path
+
+def _init_worker(model_name: str):
+    """Loads the model once when a worker process starts."""
+    global _worker_tts
+    _worker_tts = _load_tts(model_name)
+
+def _synthesize_in_worker(text: str, output_path: str) -> str:
+    return _synthesize(_worker_tts, text, output_path)
 
 class CoquiHandler:
-    def __init__(self, model_name="tts_models/en/ljspeech/tacotron2-DDC"):
+    def __init__(self, model_name="tts_models/en/ljspeech/tacotron2-DDC", workers=1):
         """
-        Initializes the Coqui TTS model.
+        Initializes the Coqui TTS handler. The model is loaded by the worker
+        processes when the first synthesis starts them.
         """
-        self.tts = TTS(model_name)
+        self.model_name = model_name
+        self.workers = workers
+        self._pool = None
 
-    def synthesize(self, text: str, output_path: str):
+    async def synthesize_async(self, text: str, output_path: str):
         """
-        Synthesizes text to speech and saves it to a file.
+        Synthesizes text to speech in a worker process, so inference neither
+        blocks the event loop nor holds this process's GIL. Requests beyond
+        the number of workers queue up and share the loaded models.
         """
-        self.tts.tts_to_file(text=text, file_path=output_path)
+        if self._pool is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name,)
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, _synthesize_in_worker, text, output_path)
+
+    def close(self):
+        """Stops the synthesis worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -2,49 +2,80 @@
 Logging configuration for the application.
 This module configures logging for the entire application.
 """
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 
-class PyMongoMessageFilter(logging.Filter):
-    """
-    Filter to exclude specific debug messages from pymongo.
-    """
-    def filter(self, record):
-        # Filter out pymongo heartbeat messages.
-        # The record.msg for pymongo.topology can be a LogMessage object, not a string or dict.
-        # To avoid a TypeError, we must handle it carefully.
-        if record.name == 'pymongo.topology':
-            # record.getMessage() safely gets the string representation.
-            if 'Server heartbeat started' in record.getMessage():
-                return False
-        return True
+# Records waiting for the listener thread; the oldest are dropped beyond this
+LOG_QUEUE_SIZE = 10000
+
+# Listener thread started by configure_logging
+_listener = None
+
+class DropOldestQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue that discards the oldest record when full."""
+
+    def enqueue(self, record):
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+def _stop_listener():
+    """Stops the listener thread after it has handled the records still queued."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+        _listener = None
+
+atexit.register(_stop_listener)
 
 def configure_logging(socket_handler=None):
     """
     Configure application logging with handlers for console and Socket.IO.
     - Console handler logs INFO and above.
     - Socket.IO handler logs DEBUG and above for the /logs page.
+    Both run on a listener thread; logging calls only put the record on a queue,
+    so request threads never block on stdout or on a Socket.IO broadcast.
     """
+    global _listener
+    _stop_listener()
+
     root_logger = logging.getLogger()
     root_logger.handlers.clear()
     root_logger.setLevel(logging.DEBUG)  # Capture everything at the root
 
-    # Console Handler for CLI output
-    console_handler = logging.StreamHandler(sys.stdout)
+    # Console Handler for CLI output; writes go through sys.stderr itself, so they
+    # stay in order with other stderr output and nothing is held in a second buffer
+    console_handler = logging.StreamHandler(sys.stderr)
     console_handler.setLevel(logging.INFO)  # Log INFO and higher to console
     console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     console_handler.setFormatter(console_formatter)
-    console_handler.addFilter(PyMongoMessageFilter())
-    root_logger.addHandler(console_handler)
+    handlers = [console_handler]
 
     # Socket.IO Handler for /logs page
     if socket_handler:
         socket_handler.setLevel(logging.DEBUG)  # Capture DEBUG and higher for web UI
         # Formatter is set in web/app.py where the handler is defined
-        socket_handler.addFilter(PyMongoMessageFilter())
-        root_logger.addHandler(socket_handler)
+        handlers.append(socket_handler)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    root_logger.addHandler(DropOldestQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
 
-    # Set levels for noisy loggers to INFO or WARNING
+    # Set levels for noisy loggers to INFO or WARNING. pymongo's server
+    # heartbeats are DEBUG records on pymongo.topology, so the logger level
+    # drops them before any handler sees (or formats) them.
     logging.getLogger('pymongo.topology').setLevel(logging.INFO)
     logging.getLogger('engineio.server').setLevel(logging.WARNING)
     logging.getLogger('socketio.server').setLevel(logging.WARNING)
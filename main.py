@@ -1,7 +1,20 @@
+import asyncio
+import threading
+
+try:
+    import uvloop
+except ImportError:  # Not available on Windows
+    uvloop = None
+
+# Must be installed before web.app creates its event loop
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 from flask import Flask
 from flask_socketio import SocketIO
 from web.app import socketio, configure_web_routes, api_logger, llm_logger
 from api import init_api_routes
+from storage.database.db_handler import db_handler
 
 # app.py now handles logging configuration
 
@@ -13,5 +26,10 @@ init_api_routes(app, api_logger, llm_logger)
 
 configure_web_routes(app)  # Register web routes
 
+db_handler.ensure_indexes()  # Make sure hot queries are index-backed
+# Character generation reads the attribute pools from memory; load them
+# without holding up startup (get_attribute_pools reads them if this hasn't finished)
+threading.Thread(target=db_handler.warm_attribute_pools, name="warm-attribute-pools", daemon=True).start()
+
 if __name__ == "__main__":
     socketio.run(app, debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,37 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pymongo import UpdateOne
+from storage.database.db_handler import db_handler
+
+def migrate_relationships():
+    """
+    Moves affinities from the embedded characters.relationships maps into the
+    relationships collection (one document per direction of a pair), then
+    removes the maps from the character documents.
+    """
+    print("Migrating relationships...")
+    characters_collection = db_handler.get_collection("characters")
+    db_handler.ensure_indexes("relationships")
+
+    writes = []
+    for character in characters_collection.find({"relationships": {"$exists": True}}, {"relationships": 1}):
+        for other_id, score in (character.get("relationships") or {}).items():
+            writes.append(UpdateOne(
+                {"char1_id": character["_id"], "char2_id": other_id},
+                {
+                    "$set": {"affinity_score": score},
+                    "$setOnInsert": {"interaction_history": []}
+                },
+                upsert=True
+            ))
+
+    db_handler.bulk_write("relationships", writes)
+    result = characters_collection.update_many({}, {"$unset": {"relationships": ""}})
+    print(f"Migrated {len(writes)} affinities from {result.modified_count} characters.")
+
+if __name__ == "__main__":
+    migrate_relationships()
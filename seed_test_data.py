@@ -1,12 +1,14 @@
 from engine.logic import CharacterEngine
 import asyncio
+import sys
 
-async def seed_test_data():
+async def seed_test_data(count: int = 2):
     print("Creating CharacterEngine instance...")
     engine = CharacterEngine()
     
-    print("Generating test characters...")
-    characters = engine.create_characters(2)
+    print(f"Generating {count} test characters...")
+    # One batch: a single insert_many for the characters and one for their relationships
+    characters = engine.create_characters(count)
     
     print(f"Created {len(characters)} characters:")
     for char in characters:
@@ -15,5 +17,7 @@ async def seed_test_data():
     return characters[0]['_id'] if characters else None
 
 if __name__ == "__main__":
-    character_id = asyncio.run(seed_test_data())
+    # Optional character count, e.g. `python seed_test_data.py 1000` for load testing
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    character_id = asyncio.run(seed_test_data(count))
     print(f"\nUse this character ID for testing: {character_id}")
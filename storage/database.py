@@ -1,5 +0,0 @@
-"""
-This file is deprecated. Use the db_handler from the `storage.database` package instead.
-"""
-# This file is intentionally left mostly empty to prevent use of the legacy client.
-from storage.database.db_handler import db_handler
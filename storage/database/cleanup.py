@@ -2,11 +2,16 @@
 Database cleanup utilities for ending seasons and clearing game data.
 """
 from . import db_handler
-from datetime import datetime
+from pymongo import ReturnDocument
+from datetime import datetime, timezone
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Collections holding a season's game data, emptied by end_season
+SEASON_COLLECTIONS = ("characters", "conversations", "messages", "message_history", "relationships")
+
 async def end_season():
     """
     End the current season by clearing all game data from the database.
@@ -16,55 +21,39 @@ async def end_season():
     try:
         logger.info("Starting season cleanup process...")
         
-        # Get database collections
-        characters_collection = db_handler.get_collection("characters")
-        conversations_collection = db_handler.get_collection("conversations")
-        messages_collection = db_handler.get_collection("messages")
-        message_history_collection = db_handler.get_collection("message_history")
-        relationships_collection = db_handler.get_collection("relationships")
-        
-        # Clear all game data
-        logger.info("Removing character data...")
-        character_result = characters_collection.delete_many({})
-        
-        logger.info("Removing conversation data...")
-        conversation_result = conversations_collection.delete_many({})
-        
-        logger.info("Removing message data...")
-        message_result = messages_collection.delete_many({})
-        
-        logger.info("Removing message history...")
-        history_result = message_history_collection.delete_many({})
+        world_state_collection = db_handler.get_async_collection("world_state")
         
-        logger.info("Removing relationship data...")
-        relationship_result = relationships_collection.delete_many({})
-        
-        # Reset world state to default
-        world_state_collection = db_handler.get_collection("world_state")
-        world_state_collection.update_one(
-            {"_id": "singleton_world_state"},
-            {"$set": {
-                "current_scene": "the_tavern",
-                "active_events": ["rumors_of_treasure"],
-                "environmental_factors": {
-                    "time_of_day": "evening",
-                    "weather": "clear"
-                }
-            }},
-            upsert=True
+        # Clear all game data and reset world state to default. The collections
+        # are independent, so all of them are cleared at the same time. Dropping
+        # is a metadata operation on the server, whereas delete_many removes
+        # every document and index entry one by one.
+        logger.info("Removing character, conversation, message, history and relationship data...")
+        await asyncio.gather(
+            *(db_handler.get_async_collection(name).drop() for name in SEASON_COLLECTIONS),
+            world_state_collection.update_one(
+                {"_id": "singleton_world_state"},
+                {"$set": {
+                    "current_scene": "the_tavern",
+                    "active_events": ["rumors_of_treasure"],
+                    "environmental_factors": {
+                        "time_of_day": "evening",
+                        "weather": "clear"
+                    }
+                }},
+                upsert=True
+            )
         )
         
-        # Log cleanup results
-        logger.info(f"Cleanup completed: Removed {character_result.deleted_count} characters, "
-                   f"{conversation_result.deleted_count} conversations, "
-                   f"{message_result.deleted_count} messages, "
-                   f"{history_result.deleted_count} history entries, "
-                   f"{relationship_result.deleted_count} relationships")
+        # The drops removed the secondary indexes too; rebuild them while the
+        # collections are empty so the next season's queries stay index-backed
+        await asyncio.gather(*(asyncio.to_thread(db_handler.ensure_indexes, name) for name in SEASON_COLLECTIONS))
+        
+        logger.info("Cleanup completed: Dropped %s", ", ".join(SEASON_COLLECTIONS))
         
         return True
     
     except Exception as e:
-        logger.error(f"Error during season cleanup: {str(e)}")
+        logger.error("Error during season cleanup: %s", e)
         return False
 
 def archive_season(season_id=None):
@@ -80,28 +69,26 @@ def archive_season(season_id=None):
     """
     db = db_handler
     
-    # If no season ID provided, get the current active season
-    if season_id is None:
-        current_season = db.get_collection("seasons").find_one({"active": True})
-        if current_season:
-            season_id = current_season["_id"]
-        else:
-            return {"error": "No active season found"}
-    
-    # Update the season status
-    result = db.get_collection("seasons").update_one(
-        {"_id": season_id},
+    # Find and end the season in one atomic step, so two callers can't both end it
+    now = datetime.now(timezone.utc)
+    season = db.get_collection("seasons").find_one_and_update(
+        {"active": True} if season_id is None else {"_id": season_id, "active": True},
         {
             "$set": {
                 "active": False,
-                "end_date": datetime.utcnow(),
+                "end_date": now,
                 "status": "completed"
             }
-        }
+        },
+        projection={"_id": 1},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count == 0:
+    if season is None:
+        if season_id is None:
+            return {"error": "No active season found"}
         return {"error": f"Failed to end season {season_id} or season not found"}
+    season_id = season["_id"]
     
     # Archive season data if needed
     # (This could move data to archive collections or perform other cleanup)
@@ -110,5 +97,5 @@ def archive_season(season_id=None):
         "success": True,
         "season_id": season_id,
         "message": f"Season {season_id} ended successfully",
-        "timestamp": datetime.utcnow()
+        "timestamp": now
     }
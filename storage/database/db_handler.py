@@ -1,18 +1,155 @@
 from pymongo import MongoClient
 from config import settings
+import asyncio
+import atexit
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Secondary indexes for the hot query paths, per collection.
+# Each entry is a list of (field, direction) keys passed to create_index,
+# or a (keys, options) tuple when the index needs options such as unique.
+# Lookups by _id (e.g. characters) use the default _id index.
+INDEXES = {
+    "characters": [
+        [("name", 1)],
+    ],
+    "messages": [
+        [("conversation_id", 1), ("timestamp", 1)],
+        [("speaker_id", 1), ("timestamp", -1)],
+        [("director_control", 1), ("speaker_type", 1), ("timestamp", -1)],
+    ],
+    "relationships": [
+        ([("char1_id", 1), ("char2_id", 1)], {"unique": True}),
+    ],
+    # archive_season looks up the active season
+    "seasons": [
+        [("active", 1)],
+    ],
+}
+
+class AsyncCollection:
+    """
+    Awaitable view of a pymongo collection for use inside coroutines.
+
+    Every call runs the blocking driver operation on a worker thread, so the
+    event loop keeps serving other coroutines while MongoDB answers. Cursors
+    are consumed in the worker thread: find and aggregate return lists.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return await asyncio.to_thread(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, *args, **kwargs):
+        """Runs find (sort/limit may be passed as keyword arguments) and returns the documents."""
+        return await asyncio.to_thread(lambda: list(self.collection.find(*args, **kwargs)))
+
+    async def aggregate(self, pipeline, **kwargs):
+        return await asyncio.to_thread(lambda: list(self.collection.aggregate(pipeline, **kwargs)))
+
+    async def insert_one(self, *args, **kwargs):
+        return await asyncio.to_thread(self.collection.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await asyncio.to_thread(self.collection.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await asyncio.to_thread(self.collection.update_one, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return await asyncio.to_thread(self.collection.find_one_and_update, *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await asyncio.to_thread(self.collection.bulk_write, *args, **kwargs)
+
+    async def drop(self, *args, **kwargs):
+        return await asyncio.to_thread(self.collection.drop, *args, **kwargs)
 
 class DatabaseHandler:
     """Database handler for MongoDB connections"""
     
     def __init__(self):
         """Initialize the database connection"""
-        self.client = MongoClient(settings.MONGO_URI)
+        # One client (and pool) is shared by every collection, sync and async
+        self.client = MongoClient(
+            settings.MONGO_URI,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+            appname=settings.MONGO_APP_NAME,
+            retryWrites=True,
+        )
         self.db = self.client.get_database(settings.DB_NAME)
+        # Collection objects by name; pymongo builds a new one on every db[name]
+        self._collections = {}
+        # Attribute pools by name, filled by warm_attribute_pools
+        self._attribute_pools = None
         
-    def get_collection(self, collection_name):
-        """Get a collection from the database"""
-        return self.db[collection_name]
+    def get_collection(self, collection_name, codec_options=None):
+        """Get a collection from the database, optionally with custom BSON codec options"""
+        if codec_options is not None:
+            return self.db.get_collection(collection_name, codec_options=codec_options)
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = self._collections[collection_name] = self.db[collection_name]
+        return collection
+
+    def get_async_collection(self, collection_name):
+        """Get an awaitable view of a collection that shares this handler's client"""
+        return AsyncCollection(self.get_collection(collection_name))
     
+    def bulk_write(self, collection_name, operations, ordered=False):
+        """
+        Sends a list of write operations (InsertOne, UpdateOne, DeleteMany, ...)
+        to one collection in a single batch. Unordered by default so the server
+        can apply them in parallel and keep going past individual failures.
+        Returns None when there is nothing to write.
+        """
+        if not operations:
+            return None
+        return self.get_collection(collection_name).bulk_write(operations, ordered=ordered)
+
+    def warm_attribute_pools(self):
+        """
+        Reads every attribute pool into memory and returns them as a dict of
+        pool name -> values. The pools are static reference data written by
+        scripts/seed.py, so get_attribute_pools serves them from here afterwards.
+        Values are interned tuples, so generated characters share one copy of
+        each attribute string.
+        """
+        pools = {
+            doc["_id"]: tuple(sys.intern(value) for value in doc["values"])
+            for doc in self.get_collection("attribute_pools").find({})
+        }
+        if pools:  # Not seeded yet otherwise; read again next time
+            self._attribute_pools = pools
+        return pools
+
+    def get_attribute_pools(self):
+        """Returns the attribute pools, reading them from the DB only on first use."""
+        return self._attribute_pools or self.warm_attribute_pools()
+
+    def ensure_indexes(self, collection_name=None):
+        """
+        Creates the indexes declared in INDEXES. create_index is a no-op for
+        indexes that already exist, so this is safe to call on every startup.
+        If collection_name is given, only that collection's indexes are created.
+        """
+        names = [collection_name] if collection_name else list(INDEXES)
+        for name in names:
+            for spec in INDEXES.get(name, []):
+                keys, options = spec if isinstance(spec, tuple) else (spec, {})
+                try:
+                    self.get_collection(name).create_index(keys, **options)
+                except Exception as e:
+                    logger.error("Failed to create index %s on %s: %s", keys, name, e)
+
     def ping(self):
         """Checks if the database connection is alive."""
         try:
@@ -28,3 +165,5 @@ class DatabaseHandler:
 
 # Create a singleton instance
 db_handler = DatabaseHandler()
+# Release pooled connections and monitor threads on interpreter exit
+atexit.register(db_handler.close)
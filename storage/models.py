@@ -1,25 +1,43 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic_core import core_schema
 from typing import List, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import partial
+import sys
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
 
 class PyObjectId(ObjectId):
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json"),
+        )
 
     @classmethod
     def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid objectid")
-        return ObjectId(v)
+        if isinstance(v, ObjectId):
+            return v
+        # Constructing parses the id once; is_valid would parse it a second time.
+        # ObjectId(None) generates a new id, so None is rejected up front.
+        if v is not None:
+            try:
+                return ObjectId(v)
+            except (InvalidId, TypeError):
+                pass
+        raise ValueError("Invalid objectid")
 
     @classmethod
-    def __get_pydantic_json_schema__(cls, core_schema, handler):
-        core_schema.update(type="string")
-        return core_schema
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return handler(core_schema.str_schema())
+
+# Documents are read from Mongo by "_id" and built in code by "id"
+MONGO_MODEL_CONFIG = ConfigDict(populate_by_name=True)
 
 class Character(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: str = Field(..., alias="_id")
     name: str
     personality: List[str]
@@ -27,7 +45,6 @@ class Character(BaseModel):
     traits: List[str]
     voice_type: str
     mood: str
-    relationships: Dict[str, float] = Field(default_factory=dict) # char_id -> affinity_score
     ethnicity: str
     religion: str
     mental_illness: List[str]
@@ -35,10 +52,18 @@ class Character(BaseModel):
     technical_iq: int
     general_iq: int
 
+    @field_validator("personality", "traits", "mental_illness", "subconscious_traits")
+    @classmethod
+    def _intern_attributes(cls, values: List[str]) -> List[str]:
+        # Attribute strings repeat across the cast; keep one copy of each
+        return [sys.intern(value) for value in values]
+
 class Message(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     conversation_id: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=partial(datetime.now, timezone.utc))
     speaker_type: str # 'player' or 'character'
     speaker_id: str
     content: str
@@ -46,25 +71,33 @@ class Message(BaseModel):
     context_tags: List[str] = Field(default_factory=list)
 
 class Conversation(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=partial(datetime.now, timezone.utc))
     participants: List[str] # list of character_ids (and maybe player_id)
     messages: List[PyObjectId] = Field(default_factory=list)
     context: Dict[str, Any] = Field(default_factory=dict)
     summary: str = ""
 
 class MessageHistory(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: str = Field(..., alias="_id") # conversation_id
     summarized_chunks: List[Dict[str, Any]] = Field(default_factory=list)
     importance_scores: Dict[str, float] = Field(default_factory=dict) # message_id -> score
 
 class WorldState(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: str = Field(..., alias="_id") # e.g., "singleton_world_state"
     current_scene: str
     active_events: List[str] = Field(default_factory=list)
     environmental_factors: Dict[str, Any] = Field(default_factory=dict)
 
 class Relationship(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     char1_id: str
     char2_id: str
@@ -72,6 +105,8 @@ class Relationship(BaseModel):
     interaction_history: List[str] = Field(default_factory=list) # list of conversation_ids
 
 class AttributePool(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: str = Field(..., alias="_id") # e.g., "personality_pool"
     values: List[str]
 
@@ -82,6 +117,8 @@ class Choice(BaseModel):
     conditions: Dict[str, Any] = Field(default_factory=dict)
 
 class Scene(BaseModel):
+    model_config = MONGO_MODEL_CONFIG
+
     id: str = Field(..., alias="_id")
     title: str
     characters: List[str] = Field(default_factory=list)  # character IDs
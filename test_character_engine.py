@@ -1,5 +1,5 @@
 import asyncio
-import json
+import orjson
 from bson.objectid import ObjectId
 from engine.logic import CharacterEngine
 from datetime import datetime
@@ -16,14 +16,14 @@ async def test_character_engine():
     interaction_result = await engine.interact(character_id, "Hello, how are you today?")
     
     print("\nInteraction Result:")
-    print(json.dumps(interaction_result, indent=2, default=str))
+    print(orjson.dumps(interaction_result, option=orjson.OPT_INDENT_2, default=str).decode())
     
     # Test observation
     print(f"\nTesting observation of character {character_id}...")
     observation_result = await engine.observe_character(character_id, "general", "The character is sitting alone by the pool.")
     
     print("\nObservation Result:")
-    print(json.dumps(observation_result, indent=2, default=str))
+    print(orjson.dumps(observation_result, option=orjson.OPT_INDENT_2, default=str).decode())
     
     print("\nAll tests completed!")
 
@@ -40,6 +40,7 @@ async def test_llm_handler():
     retrieved = await handler.retrieve_context("Tell me about programming", context_data)
     logger.info(f"Retrieved context: {retrieved}")
     
+    await handler.close()
     logger.info("All tests completed!")
 
 if __name__ == "__main__":
@@ -1,7 +1,11 @@
 import logging
 import asyncio
-from flask import Flask, jsonify, render_template, request, session
-from flask_socketio import SocketIO, emit
+import threading
+import time
+from collections import deque
+from flask import Flask, Response, jsonify, render_template, request, session
+from flask_socketio import SocketIO, emit, join_room
+import orjson
 import os
 import sys
 
@@ -11,12 +15,29 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from storage.database.db_handler import db_handler
 from engine.logic.game_loop import GameLoop
 from engine.logic.character_engine import CharacterEngine
-from engine.ai.llm_handler import LLMHandler
+from engine.ai.llm_handler import get_llm_handler
 from logging_config import configure_logging
 
 # Initialize but don't create the Flask app here
 socketio = SocketIO(async_mode='threading')
-llm_handler = LLMHandler()
+# Socket.IO rooms: game events go to director dashboards, log lines to log viewers
+DIRECTOR_ROOM = 'director'
+LOGS_ROOM = 'logs'
+llm_handler = get_llm_handler()
+# Used by the status, character list and story start handlers
+characters_collection = db_handler.get_collection("characters")
+
+# Long-lived event loop for running coroutines from synchronous request handlers
+async_loop = asyncio.new_event_loop()
+threading.Thread(target=async_loop.run_forever, name="async-loop", daemon=True).start()
+
+def run_async(coro, timeout=None):
+    """
+    Runs a coroutine on async_loop and waits for its result. Unlike asyncio.run,
+    the loop outlives the call, so the LLM client's pooled connections and
+    background tasks such as conversation summaries carry over between requests.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, async_loop).result(timeout)
 
 # In-memory game state management
 game_state = {
@@ -25,18 +46,73 @@ game_state = {
     "status": "Idle"
 }
 
-# In-memory log storage for the /logs page
-log_capture = []
+# Dependency checks reported by /api/status, reused for STATUS_CACHE_TTL seconds
+# so dashboard polling doesn't hit the DB and the LLM server on every request
+STATUS_CACHE_TTL = 2.0
+# An LLM server that doesn't answer within this many seconds is reported as down
+STATUS_LLM_PING_TIMEOUT = 0.5
+_status_cache = {"checked_at": 0.0, "checks": None}
+
+# Character documents for the API, with _id exposed as id
+_CHARACTER_LIST_PIPELINE = [
+    {"$addFields": {"id": "$_id"}},
+    {"$project": {"_id": 0}},
+]
+
+def _json_response(data, status=200):
+    """Encodes character documents with orjson instead of Flask's stdlib JSON provider."""
+    return Response(orjson.dumps(data, default=str), status=status, mimetype="application/json")
+
+# In-memory log storage for the /logs page; only the most recent lines are kept
+LOG_CAPTURE_SIZE = 5000
+log_capture = deque(maxlen=LOG_CAPTURE_SIZE)
+
+# Log lines are sent to clients in batches of up to LOG_BATCH_SIZE lines,
+# at most LOG_BATCH_DELAY seconds after the first line of the batch
+LOG_BATCH_SIZE = 64
+LOG_BATCH_DELAY = 0.05
 
 # Define a handler that emits logs to Socket.IO clients
 class SocketIOHandler(logging.Handler):
+    """
+    Captures log lines for the /logs page and broadcasts them to Socket.IO
+    clients as log_update_batch messages. Records logged with
+    extra={"broadcast": False} are captured but not broadcast.
+    """
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self._pending = []
+        self._timer = None
+
+    # Called on the logging listener thread, see configure_logging
     def emit(self, record):
-        log_entry = self.format(record)
-        # Avoid sending pymongo heartbeats to the web UI
-        if 'Server heartbeat started' in log_entry:
-            return
-        log_capture.append(log_entry)
-        socketio.emit('log_update', {'log': log_entry})
+        try:
+            log_entry = self.format(record)
+            log_capture.append(log_entry)
+            if not getattr(record, "broadcast", True):
+                return
+            with self.lock:
+                self._pending.append(log_entry)
+                if len(self._pending) < LOG_BATCH_SIZE:
+                    if self._timer is None:
+                        self._timer = threading.Timer(LOG_BATCH_DELAY, self.flush)
+                        self._timer.daemon = True
+                        self._timer.start()
+                    return
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Broadcasts the pending log lines as one message."""
+        with self.lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if batch:
+            socketio.emit('log_update_batch', {'logs': batch}, to=LOGS_ROOM)
 
 # Create the handler instance
 socketio_handler = SocketIOHandler()
@@ -49,27 +125,19 @@ configure_logging(socket_handler=socketio_handler)
 api_logger = logging.getLogger('api')
 llm_logger = logging.getLogger('llm')
 
-@socketio.on('connect')
-def handle_connect():
-    """Send story history to a newly connected client if a game is in progress."""
-    if game_state.get("is_running") and game_state.get("game_loop"):
-        api_logger.info("Client connected, sending story history.")
-        history = game_state["game_loop"].get_story_history()
-        emit('story_update', history)
-    else:
-        api_logger.info("Client connected, no active game.")
-
 def configure_web_routes(app):
     """Configure all web routes with the provided Flask app"""
     app.config['SECRET_KEY'] = 'secret!'  # Replace with a real secret key
+    app.config['ASYNC_LOOP'] = async_loop
     app.static_folder = os.path.join(os.path.dirname(__file__), 'static')
     app.template_folder = os.path.join(os.path.dirname(__file__), 'templates')
     
+    # The dashboard template ships with the app, so check for it once
+    index_present = os.path.exists(os.path.join(app.template_folder, 'index.html'))
+
     @app.route("/")
     def index():
-        # Ensure templates directory exists
-        template_path = os.path.join(app.template_folder, 'index.html')
-        if os.path.exists(template_path):
+        if index_present:
             return render_template("index.html")
         else:
             return jsonify({
@@ -79,16 +147,14 @@ def configure_web_routes(app):
 
     @app.route("/logs")
     def logs():
-        return render_template("logs.html", logs=log_capture)
+        # Copied so the listener thread can keep appending while the page renders
+        return render_template("logs.html", logs=list(log_capture))
         
     @app.route("/api/characters")
     def list_characters():
-        characters_collection = db_handler.get_collection("characters")
-        characters = list(characters_collection.find({}))
-        for char in characters:
-            char["id"] = char["_id"]
-            del char["_id"]
-        return jsonify(characters)
+        # The server renames _id to id, so documents are returned as decoded
+        characters = list(characters_collection.aggregate(_CHARACTER_LIST_PIPELINE))
+        return _json_response(characters)
 
     @app.route("/api/characters/create", methods=["POST"])
     def create_character_endpoint():
@@ -99,11 +165,10 @@ def configure_web_routes(app):
             # create_character is synchronous
             new_char = game_state["game_loop"].character_engine.create_character()
             # The returned doc has _id, need to convert for JSON response
-            new_char["id"] = new_char["_id"]
-            del new_char["_id"]
-            return jsonify(new_char), 201
+            new_char["id"] = new_char.pop("_id")
+            return _json_response(new_char, 201)
         except Exception as e:
-            logging.error(f"Error creating character: {e}")
+            logging.error("Error creating character: %s", e)
             return jsonify({"message": f"An internal error occurred: {str(e)}"}), 500
 
     @app.route("/api/characters/create_batch", methods=["POST"])
@@ -120,58 +185,75 @@ def configure_web_routes(app):
         try:
             new_chars = game_state["game_loop"].character_engine.create_characters(count)
             
+            # Built in memory by the engine, so renamed here rather than re-read
             for char in new_chars:
-                char["id"] = char["_id"]
-                del char["_id"]
+                char["id"] = char.pop("_id")
             
-            logging.info(f"Cast of {count} contestants created successfully.")
+            logging.info("Cast of %s contestants created successfully.", count)
 
-            return jsonify(new_chars), 201
+            return _json_response(new_chars, 201)
         except Exception as e:
-            logging.error(f"Error creating cast: {e}")
+            logging.error("Error creating cast: %s", e)
             return jsonify({"message": f"Cast creation error: {str(e)}"}), 500
 
     @app.route("/api/status")
     def status():
+        checks = _status_cache["checks"]
+        if checks is None or time.monotonic() - _status_cache["checked_at"] >= STATUS_CACHE_TTL:
+            checks = _check_dependencies()
+            _status_cache.update(checked_at=time.monotonic(), checks=checks)
+
+        return jsonify({
+            "status": "ok",
+            "season_status": game_state["status"],
+            "director_role": "external_observer",
+            **checks
+        })
+
+    def _check_dependencies():
+        """Pings the DB and the LLM server and counts the cast, for /api/status."""
         try:
             db_ok = db_handler.ping()
         except Exception:
             db_ok = False
         
         try:
-            llm_ok = asyncio.run(llm_handler.ping())
-        except Exception:
+            llm_ok = run_async(asyncio.wait_for(llm_handler.ping(), timeout=STATUS_LLM_PING_TIMEOUT))
+        except Exception:  # Including the ping timing out
             llm_ok = False
 
-        characters_collection = db_handler.get_collection("characters")
-        character_count = characters_collection.count_documents({})
+        # Collection metadata count; no scan of the characters collection
+        character_count = characters_collection.estimated_document_count()
 
-        return jsonify({
-            "status": "ok",
-            "season_status": game_state["status"],
+        return {
             "cast_size": character_count,
-            "director_role": "external_observer",
             "dependencies": {
                 "database": "ok" if db_ok else "error",
                 "llm": "ok" if llm_ok else "error"
             }
-        })
+        }
 
     @app.route("/api/llm/models")
     def get_llm_models():
         try:
-            models = asyncio.run(llm_handler.get_running_models())
+            models = run_async(llm_handler.get_running_models())
             return jsonify(models)
         except Exception as e:
-            logging.error(f"Error fetching LLM models: {e}")
+            logging.error("Error fetching LLM models: %s", e)
             return jsonify({"error": "Failed to fetch LLM models"}), 500
 
 # Register socket handlers
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
+    # The /logs page connects with auth {"role": "logs"}; it only receives log lines
+    if (auth or {}).get('role') == LOGS_ROOM:
+        join_room(LOGS_ROOM)
+        return
+
+    join_room(DIRECTOR_ROOM)
     session['user_id'] = "director" # example
-    logging.info('Director connected to control dashboard')
-    logging.debug(f"SocketIO session ID: {request.sid}")
+    logging.info('Director connected to control dashboard', extra={"broadcast": False})
+    logging.debug("SocketIO session ID: %s", request.sid)
     emit('game_state', {"status": game_state["status"]})
 
     # Load and emit story history
@@ -180,7 +262,7 @@ def handle_connect():
         # Story messages are marked with director_control=True
         story_messages = list(messages_collection.find({"director_control": True}).sort("timestamp", 1))
         
-        logging.info(f"Found {len(story_messages)} narrator messages to replay to new client.")
+        logging.info("Found %d narrator messages to replay to new client.", len(story_messages))
 
         for message in story_messages:
             update_data = {
@@ -193,17 +275,17 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    logging.info('Director disconnected from control dashboard')
+    logging.info('Director disconnected from control dashboard', extra={"broadcast": False})
 
 @socketio.on('start_game')
 def handle_start_game():
     if not game_state["is_running"]:
         logging.info("Director starting new season...")
         game_state["game_loop"] = GameLoop()
-        asyncio.run(game_state["game_loop"].start())
+        run_async(game_state["game_loop"].start())
         game_state["is_running"] = True
         game_state["status"] = "Season in Progress"
-        emit('game_state', {"status": game_state["status"], "message": "New season started. Ready for cast creation."}, broadcast=True)
+        emit('game_state', {"status": game_state["status"], "message": "New season started. Ready for cast creation."}, to=DIRECTOR_ROOM)
         logging.info("New season started.")
 
 @socketio.on('end_game')
@@ -212,16 +294,16 @@ def handle_end_game():
         logging.info("Director ending current season...")
         try:
             if game_state.get("game_loop"):
-                asyncio.run(game_state["game_loop"].end_game()) # This will clear data
+                run_async(game_state["game_loop"].end_game()) # This will clear data
         except Exception as e:
-            logging.error(f"Error during game_loop.end_game(): {e}")
+            logging.error("Error during game_loop.end_game(): %s", e)
             emit('error', {'message': f'Error during season cleanup: {str(e)}'})
         
         # Reset server state regardless of cleanup success
         game_state["is_running"] = False
         game_state["status"] = "Idle"
         game_state["game_loop"] = None
-        emit('game_state', {"status": "Idle", "message": "Season ended. All data archived and cleared."}, broadcast=True)
+        emit('game_state', {"status": "Idle", "message": "Season ended. All data archived and cleared."}, to=DIRECTOR_ROOM)
         logging.info("Season ended and data cleared.")
 
 @socketio.on('director_choice')
@@ -232,21 +314,21 @@ def handle_director_choice(data):
 
     choice_text = data.get('choice')
     model = data.get('model', 'gemma3:4b')
-    logging.info(f"Director selected choice: {choice_text} with model {model}")
+    logging.info("Director selected choice: %s with model %s", choice_text, model)
     
     if not choice_text:
         emit('error', {'message': 'Missing choice selection.'})
         return
 
     try:
-        response = asyncio.run(
+        response = run_async(
             game_state["game_loop"].progress_story(choice_text, model=model)
         )
         response['source'] = 'NARRATOR'
-        emit('story_update', response, broadcast=True)
+        emit('story_update', response, to=DIRECTOR_ROOM)
         logging.info("Story progressed successfully.")
     except Exception as e:
-        logging.error(f"Error during story progression: {e}")
+        logging.error("Error during story progression: %s", e)
         emit('error', {'message': f'Director control error: {str(e)}'})
 
 @socketio.on('observe_character')
@@ -265,7 +347,7 @@ def handle_observe_character(data):
         return
 
     try:
-        response = asyncio.run(
+        response = run_async(
             game_state["game_loop"].character_engine.observe_character(character_id, observation_type, context, model=model)
         )
 
@@ -274,9 +356,9 @@ def handle_observe_character(data):
         else:
             response['source'] = 'OBSERVATION'
             response['character_id'] = character_id
-            emit('character_observation', response, broadcast=True)
+            emit('character_observation', response, to=DIRECTOR_ROOM)
     except Exception as e:
-        logging.error(f"Error during character observation: {e}")
+        logging.error("Error during character observation: %s", e)
         emit('error', {'message': f'Observation error: {str(e)}'})
 
 
@@ -287,17 +369,14 @@ def handle_start_story(data):
         return
 
     try:
-        # Check if we have characters
-        characters_collection = db_handler.get_collection("characters")
-        character_count = characters_collection.count_documents({})
-        
-        if character_count == 0:
+        # Check if we have characters; one _id is enough, no need to count them
+        if characters_collection.find_one({}, {"_id": 1}) is None:
             emit('error', {'message': 'No cast created yet. Please create a cast first.'})
             return
 
         model = data.get('model', 'gemma3:4b') if data else 'gemma3:4b'
-        logging.info(f"Director starting story with model {model}...")
-        story_data = asyncio.run(game_state["game_loop"].start_story(model=model))
+        logging.info("Director starting story with model %s...", model)
+        story_data = run_async(game_state["game_loop"].start_story(model=model))
         
         if story_data and "error" in story_data:
             emit('error', {'message': story_data["error"]})
@@ -306,17 +385,8 @@ def handle_start_story(data):
         story_data['source'] = 'NARRATOR'
         # Use director_choices key for frontend consistency
         story_data['director_choices'] = story_data.pop('choices', [])
-        emit('story_update', story_data, broadcast=True)
+        emit('story_update', story_data, to=DIRECTOR_ROOM)
         logging.info("Story started successfully.")
     except Exception as e:
-        logging.error(f"Error starting story: {e}")
+        logging.error("Error starting story: %s", e)
         emit('error', {'message': f'Failed to start story: {str(e)}'})
-
-# To run this application, create a `run.py` file in the root of your workspace with:
-#
-# from web.app import app, socketio
-#
-# if __name__ == '__main__':
-#     socketio.run(app, debug=True, port=5000, host='0.0.0.0')
-#
-# Then run `python run.py` in your terminal.